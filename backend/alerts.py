@@ -0,0 +1,153 @@
+"""Single background poller of the Zabbix problem set.
+
+``AlertPoller`` calls ``trigger.get`` (problems only) every
+``ALERT_POLL_INTERVAL`` seconds and publishes the result as an immutable
+``AlertSnapshot`` with a version and an ETag derived from its content. API
+readers serve the current snapshot (``/api/alerts`` answers
+``If-None-Match`` with 304) and consumers such as ``EmailNotifier``
+subscribe to ``AlertDiff``s between snapshots, so Zabbix sees one poll per
+interval however many clients are connected.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Mapping, NamedTuple
+
+from zabbix_api import ZabbixAPI
+
+ALERT_POLL_INTERVAL = float(os.getenv("ALERT_POLL_INTERVAL", "30"))  # seconds
+
+
+class AlertSnapshot(NamedTuple):
+    """The open problems at one point in time; never mutated once published."""
+
+    version: int
+    etag: str
+    triggers: tuple[Mapping, ...]  # trigger.get rows, newest change first
+    fetched_at: float  # time.time() of the poll that saw this problem set first
+
+    @property
+    def by_id(self) -> dict[str, Mapping]:
+        return {t["triggerid"]: t for t in self.triggers}
+
+
+class AlertDiff(NamedTuple):
+    new: list[Mapping]
+    resolved: list[Mapping]
+
+
+def _etag(triggers: list[dict]) -> str:
+    canonical = json.dumps(sorted(triggers, key=lambda t: t["triggerid"]), sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+
+def _freeze(trigger: dict) -> Mapping:
+    frozen = dict(trigger)
+    if "hosts" in frozen:
+        frozen["hosts"] = tuple(MappingProxyType(dict(h)) for h in frozen["hosts"])
+    return MappingProxyType(frozen)
+
+
+class AlertPoller:
+    """Polls ``trigger.get`` in the background and publishes snapshots."""
+
+    def __init__(self, api: ZabbixAPI | None = None, interval: float = ALERT_POLL_INTERVAL):
+        self.api = api or ZabbixAPI()
+        self.interval = interval
+        self.snapshot: AlertSnapshot | None = None
+        self.error: Exception | None = None
+        self.polls = 0
+        self.last_poll: float | None = None  # time.time() of the last successful poll
+        self._lock = threading.Lock()  # one poll at a time
+        self._listeners: list[Callable[[AlertDiff], None]] = []
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def subscribe(self, callback: Callable[[AlertDiff], None]):
+        """Call ``callback(diff)`` on the poller thread whenever problems
+        appear or resolve. The first snapshot reports every problem as new."""
+        self._listeners.append(callback)
+
+    def current(self) -> AlertSnapshot:
+        """The latest snapshot, polling once if there is none yet."""
+        if self.snapshot is None:
+            self.poll()
+            if self.snapshot is None:
+                raise self.error or RuntimeError("no alert snapshot yet")
+        return self.snapshot
+
+    def poll(self) -> AlertSnapshot | None:
+        """Fetch the problem set and publish it if it changed."""
+        with self._lock:
+            try:
+                triggers = self.api.problem_get()
+            except Exception as exc:  # noqa: BLE001
+                self.error = exc
+                print(f"[AlertPoller] trigger.get failed: {exc}")
+                return self.snapshot
+            self.polls += 1
+            self.last_poll = time.time()
+            self.error = None
+            etag = _etag(triggers)
+            previous = self.snapshot
+            if previous is not None and previous.etag == etag:
+                return previous
+            snapshot = AlertSnapshot(
+                version=(previous.version + 1) if previous else 1,
+                etag=etag,
+                triggers=tuple(_freeze(t) for t in triggers),
+                fetched_at=time.time(),
+            )
+            self.snapshot = snapshot
+            self._publish(previous, snapshot)  # in order, one poll at a time
+        return snapshot
+
+    def _publish(self, previous: AlertSnapshot | None, snapshot: AlertSnapshot):
+        old = previous.by_id if previous else {}
+        new = snapshot.by_id
+        diff = AlertDiff(
+            new=[t for i, t in new.items() if i not in old],
+            resolved=[t for i, t in old.items() if i not in new],
+        )
+        if not diff.new and not diff.resolved:
+            return  # only details such as the description changed
+        for callback in self._listeners:
+            try:
+                callback(diff)
+            except Exception as exc:  # noqa: BLE001
+                print(f"[AlertPoller] subscriber error: {exc}")
+
+    def start(self):
+        """Start polling in the background (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="alert-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self.interval)
+
+    def stats(self) -> dict:
+        snap = self.snapshot
+        return {
+            "polls": self.polls,
+            "version": snap.version if snap else 0,
+            "problems": len(snap.triggers) if snap else 0,
+            "age_s": round(time.time() - self.last_poll, 1) if self.last_poll else None,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+alert_poller = AlertPoller()
@@ -1,21 +1,58 @@
 """Background thread that periodically analyzes metrics to find anomalies."""
 
+import os
 import threading
 import time
 from datetime import datetime, timedelta, timezone
+from typing import Callable
 
-from sqlalchemy import select, and_, func, insert
+from sqlalchemy import select, and_, or_, func, insert
 
-from database import engine, metrics_table, anomalies_table
+from anomaly_engine import ANOMALY_ALGORITHMS, AnomalyEngine
+from database import engine, metrics_table, anomalies_table, series_table
 
 DETECT_INTERVAL = 300  # seconds
 
+# "poll": this thread re-scans the last hour every DETECT_INTERVAL.
+# "stream": the collector checks each point as it arrives (stream_detector.py).
+ANOMALY_MODE = os.getenv("ANOMALY_MODE", "poll")
+
+_anomaly_listeners: list[Callable[[list[dict]], None]] = []
+
+
+def subscribe_anomalies(callback: Callable[[list[dict]], None]):
+    """Call ``callback(anomalies)`` with the stored rows (including ``id``)
+    whenever a detector reports new anomalies."""
+    _anomaly_listeners.append(callback)
+
+
+def record_anomalies(conn, anomalies: list[dict]) -> list[dict]:
+    """Insert *anomalies* in one statement and return the stored rows."""
+    if not anomalies:
+        return []
+    stmt = insert(anomalies_table).returning(anomalies_table)
+    return [dict(r) for r in conn.execute(stmt, anomalies).mappings()]
+
+
+def publish_anomalies(stored: list[dict]):
+    """Hand committed anomalies to the subscribers."""
+    if not stored:
+        return
+    for callback in _anomaly_listeners:
+        try:
+            callback(stored)
+        except Exception as exc:
+            print(f"[AnomalyDetector] subscriber error: {exc}")
+
+
 class AnomalyDetector(threading.Thread):
     """Periodically analyze metrics to find anomalies."""
 
     def __init__(self):
         super().__init__(daemon=True)
         self._stop_event = threading.Event()
+        # Per-item_key detector selection; without it the set-based 3-sigma query runs
+        self.engine = AnomalyEngine() if ANOMALY_ALGORITHMS else None
 
     def stop(self):
         self._stop_event.set()
@@ -31,68 +68,104 @@ class AnomalyDetector(threading.Thread):
                 self._stop_event.wait(DETECT_INTERVAL)
 
     def detect_anomalies_once(self):
-        """Check for anomalies in the last hour of metric data."""
+        """Check for anomalies in the last hour of metric data.
+
+        A single set-based query computes mean/stddev and the latest value of
+        every series in the window and keeps those outside 3 sigma that have
+        no anomaly reported in the same window; the results are written with
+        one bulk insert.
+        """
+        since = datetime.now(timezone.utc) - timedelta(hours=1)
+        if self.engine is not None:
+            return self._detect_with_engine(since)
         with engine.begin() as conn:
-            # Get all distinct host/item pairs
-            metric_pairs_stmt = select(metrics_table.c.host_id, metrics_table.c.item_key).distinct()
-            metric_pairs = conn.execute(metric_pairs_stmt).fetchall()
-
-            since = datetime.now(timezone.utc) - timedelta(hours=1)
-
-            for host_id, item_key in metric_pairs:
-                # For each pair, get stats for the last hour
-                stats_stmt = select(
-                    func.avg(metrics_table.c.value).label("mean"),
-                    func.stddev(metrics_table.c.value).label("stddev")
-                ).where(
-                    and_(
-                        metrics_table.c.host_id == host_id,
-                        metrics_table.c.item_key == item_key,
-                        metrics_table.c.timestamp >= since
-                    )
-                )
-                stats = conn.execute(stats_stmt).first()
-
-                if stats and stats.mean is not None and stats.stddev is not None:
-                    mean = stats.mean
-                    stddev = stats.stddev
-                    # 3-sigma rule
-                    upper_bound = mean + (3 * stddev)
-                    lower_bound = mean - (3 * stddev)
-
-                    # Find the latest metric value to check against the bounds
-                    latest_metric_stmt = select(metrics_table.c.value, metrics_table.c.timestamp)\
-                        .where(
-                            and_(
-                                metrics_table.c.host_id == host_id,
-                                metrics_table.c.item_key == item_key
-                            )
-                        ).order_by(metrics_table.c.timestamp.desc()).limit(1)
-                    
-                    latest_metric = conn.execute(latest_metric_stmt).first()
-
-                    if latest_metric and (latest_metric.value > upper_bound or latest_metric.value < lower_bound):
-                        # Check if this anomaly was already reported recently
-                        recent_anomaly_stmt = select(anomalies_table).where(
-                            and_(
-                                anomalies_table.c.host_id == host_id,
-                                anomalies_table.c.item_key == item_key,
-                                anomalies_table.c.timestamp >= since
-                            )
-                        ).limit(1)
-                        
-                        if conn.execute(recent_anomaly_stmt).first():
-                            continue # Already reported
-
-                        # Insert new anomaly
-                        conn.execute(
-                            insert(anomalies_table),
-                            [{
-                                "host_id": host_id,
-                                "item_key": item_key,
-                                "value": latest_metric.value,
-                                "timestamp": latest_metric.timestamp,
-                                "reason": f"3-sigma rule (mean={mean:.2f}, stddev={stddev:.2f})"
-                            }]
-                        )
-                        print(f"[AnomalyDetector] New anomaly detected for {host_id}/{item_key}: value {latest_metric.value:.2f}")
+            candidates = conn.execute(anomaly_candidates_stmt(since)).fetchall()
+            if not candidates:
+                return
+            stored = record_anomalies(
+                conn,
+                [
+                    {
+                        "host_id": c.host_id,
+                        "item_key": c.item_key,
+                        "value": c.value,
+                        "timestamp": c.timestamp,
+                        "reason": f"3-sigma rule (mean={c.mean:.2f}, stddev={c.stddev:.2f})",
+                    }
+                    for c in candidates
+                ],
+            )
+        publish_anomalies(stored)
+        for c in candidates:
+            print(f"[AnomalyDetector] New anomaly detected for {c.host_id}/{c.item_key}: value {c.value:.2f}")
+
+    def _detect_with_engine(self, since: datetime):
+        """Run the configured vectorized detectors over all series at once."""
+        a = anomalies_table.c
+        with engine.begin() as conn:
+            reported = set(
+                conn.execute(select(a.host_id, a.item_key).where(a.timestamp >= since).distinct()).all()
+            )
+            found = self.engine.run(conn, skip=reported)
+            stored = record_anomalies(conn, found)
+        publish_anomalies(stored)
+        for f in found:
+            print(f"[AnomalyDetector] New anomaly detected for {f['host_id']}/{f['item_key']}: {f['reason']}")
+
+
+def anomaly_candidates_stmt(since: datetime):
+    """Latest value of every series since *since* that breaks the 3-sigma rule
+    and has not been reported since then."""
+    m = metrics_table.c
+    recent = m.timestamp >= since
+    stats = (
+        select(
+            m.series_id,
+            func.avg(m.value).label("mean"),
+            func.stddev(m.value).label("stddev"),
+        )
+        .where(recent)
+        .group_by(m.series_id)
+        .cte("stats")
+    )
+    latest = (
+        select(m.series_id, m.value, m.timestamp)
+        .where(recent)
+        .distinct(m.series_id)
+        .order_by(m.series_id, m.timestamp.desc())
+        .cte("latest")
+    )
+    s, a = series_table.c, anomalies_table.c
+    reported = (
+        select(a.id)
+        .where(
+            and_(
+                a.host_id == s.host_id,
+                a.item_key == s.item_key,
+                a.timestamp >= since,
+            )
+        )
+        .exists()
+    )
+    return (
+        select(
+            s.host_id,
+            s.item_key,
+            latest.c.value,
+            latest.c.timestamp,
+            stats.c.mean,
+            stats.c.stddev,
+        )
+        .join_from(latest, stats, stats.c.series_id == latest.c.series_id)
+        .join(series_table, s.id == latest.c.series_id)
+        .where(
+            and_(
+                stats.c.stddev.is_not(None),
+                or_(
+                    latest.c.value > stats.c.mean + 3 * stats.c.stddev,
+                    latest.c.value < stats.c.mean - 3 * stats.c.stddev,
+                ),
+                ~reported,
+            )
+        )
+    )
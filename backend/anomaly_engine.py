@@ -0,0 +1,311 @@
+"""Pluggable, vectorized anomaly detectors run over all series at once.
+
+The engine loads every series' recent history into one 2-D array
+(series x time bucket, NaN for gaps) per lookback/resolution needed by the
+configured detectors, then each detector checks the latest point of all its
+series in a few NumPy operations:
+
+* ``three_sigma`` - mean +/- 3 standard deviations (the classic rule)
+* ``mad`` - robust z-score from the median and median absolute deviation
+* ``seasonal`` - hour-of-day baseline over the last week of hourly averages
+* ``isolation_forest`` - IsolationForest over all selected metrics of a host
+
+Detectors are chosen per ``item_key`` with ``ANOMALY_ALGORITHMS``, e.g.
+``"system.cpu.util=mad;net.if.in[*]=seasonal;*=three_sigma"`` (first
+matching glob wins; only ``*`` and ``?`` are wildcards, brackets are literal).
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sqlalchemy import func, select
+
+from database import metrics_table
+from rollups import RAW_RESOLUTION, available_tiers, rollup_tables
+from series import series_cache
+from series_query import glob_match
+
+ANOMALY_ALGORITHMS = os.getenv("ANOMALY_ALGORITHMS", "")
+# Anomaly score (0..1, as in the IsolationForest paper) above which a
+# host's latest sample is flagged; Gaussian noise stays below ~0.63
+ISOLATION_FOREST_THRESHOLD = float(os.getenv("ISOLATION_FOREST_THRESHOLD", "0.65"))
+
+
+class SeriesWindow(NamedTuple):
+    """Recent history of many series on a common time grid."""
+
+    keys: list[tuple[str, str]]  # (host_id, item_key) per row
+    times: np.ndarray  # bucket start, datetime64[s], shape (T,)
+    values: np.ndarray  # shape (S, T), NaN where no sample
+
+
+class Detection(NamedTuple):
+    row: int  # index into SeriesWindow.keys
+    column: int  # index into SeriesWindow.times
+    value: float
+    reason: str
+
+
+def latest_points(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Column of the last non-NaN value of every row (-1 if the row is empty)
+    and that value."""
+    present = ~np.isnan(values)
+    last = values.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    last[~present.any(axis=1)] = -1
+    return last, values[np.arange(len(values)), last]
+
+
+class Detector:
+    """Base class: flag the latest point of each row in a window."""
+
+    name = ""
+    lookback = timedelta(hours=1)
+    resolution = RAW_RESOLUTION  # seconds per column
+
+    def detect(self, window: SeriesWindow, rows: np.ndarray) -> list[Detection]:
+        raise NotImplementedError
+
+
+class ThreeSigmaDetector(Detector):
+    name = "three_sigma"
+
+    def __init__(self, sigma: float = 3.0, min_samples: int = 10):
+        self.sigma = sigma
+        self.min_samples = min_samples
+
+    def detect(self, window, rows):
+        values = window.values[rows]
+        last, x = latest_points(values)
+        mean = np.nanmean(values, axis=1)
+        std = np.nanstd(values, axis=1, ddof=1)
+        count = (~np.isnan(values)).sum(axis=1)
+        hit = (count >= self.min_samples) & (std > 0) & (np.abs(x - mean) > self.sigma * std)
+        return [
+            Detection(rows[i], last[i], x[i], f"3-sigma rule (mean={mean[i]:.2f}, stddev={std[i]:.2f})")
+            for i in np.flatnonzero(hit)
+        ]
+
+
+class MADDetector(Detector):
+    name = "mad"
+
+    def __init__(self, threshold: float = 3.5, min_samples: int = 10):
+        self.threshold = threshold
+        self.min_samples = min_samples
+
+    def detect(self, window, rows):
+        values = window.values[rows]
+        last, x = latest_points(values)
+        median = np.nanmedian(values, axis=1)
+        mad = np.nanmedian(np.abs(values - median[:, None]), axis=1)
+        count = (~np.isnan(values)).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = 0.6745 * (x - median) / mad
+        hit = (count >= self.min_samples) & (mad > 0) & (np.abs(z) > self.threshold)
+        return [
+            Detection(rows[i], last[i], x[i], f"mad (median={median[i]:.2f}, mad={mad[i]:.2f}, z={z[i]:.1f})")
+            for i in np.flatnonzero(hit)
+        ]
+
+
+class SeasonalDetector(Detector):
+    """Compare the current hour with the same hour of day on previous days."""
+
+    name = "seasonal"
+    lookback = timedelta(days=7)
+    resolution = 3600
+
+    def __init__(self, sigma: float = 3.0, min_days: int = 3):
+        self.sigma = sigma
+        self.min_days = min_days
+
+    def detect(self, window, rows):
+        values = window.values[rows]
+        current = values[:, -1]
+        hours = (window.times.astype("datetime64[h]").astype(np.int64) % 24)
+        same_hour = hours[:-1] == hours[-1]
+        history = values[:, :-1][:, same_hour]
+        baseline = np.nanmean(history, axis=1) if history.size else np.full(len(rows), np.nan)
+        std = np.nanstd(history, axis=1, ddof=1) if history.size else np.full(len(rows), np.nan)
+        days = (~np.isnan(history)).sum(axis=1)
+        hit = (
+            ~np.isnan(current)
+            & (days >= self.min_days)
+            & (std > 0)
+            & (np.abs(current - baseline) > self.sigma * std)
+        )
+        col = len(window.times) - 1
+        return [
+            Detection(
+                rows[i], col, current[i],
+                f"seasonal (hour={int(hours[-1])}, baseline={baseline[i]:.2f}, stddev={std[i]:.2f})",
+            )
+            for i in np.flatnonzero(hit)
+        ]
+
+
+class IsolationForestDetector(Detector):
+    """Score each host's latest multi-metric sample with one IsolationForest.
+
+    Values are z-scored per series, so a single model trained on the recent
+    (host, time) samples of all hosts learns what joint deviations across a
+    host's metrics look like; every host's latest sample is then scored in
+    one call. Samples whose anomaly score exceeds a fixed *threshold* are
+    flagged, so a quiet fleet produces no detections (a contamination rate
+    would flag its most outlying share on every pass).
+    """
+
+    name = "isolation_forest"
+
+    def __init__(self, min_samples: int = 20, n_estimators: int = 100, threshold: float = ISOLATION_FOREST_THRESHOLD):
+        self.min_samples = min_samples
+        self.n_estimators = n_estimators
+        self.threshold = threshold
+
+    def detect(self, window, rows):
+        host_codes, hosts = pd.factorize(np.array([window.keys[r][0] for r in rows], dtype=object))
+        key_codes, keys = pd.factorize(np.array([window.keys[r][1] for r in rows], dtype=object))
+        if len(keys) < 2:
+            return []
+        cube = np.full((len(hosts), len(keys), window.values.shape[1]), np.nan)
+        cube[host_codes, key_codes] = window.values[rows]
+        series_row = np.full((len(hosts), len(keys)), -1)
+        series_row[host_codes, key_codes] = rows
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nanmean(cube, axis=2, keepdims=True)
+            std = np.nanstd(cube, axis=2, keepdims=True)
+            z = np.nan_to_num((cube - mean) / np.where(std > 0, std, 1.0))
+        present = ~np.isnan(cube).all(axis=1)  # hosts x time
+        counts = present.sum(axis=1)
+        last = window.values.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+        eligible = np.flatnonzero(counts >= self.min_samples)
+        if not len(eligible):
+            return []
+
+        samples = z.transpose(0, 2, 1)[present]  # (host, time) samples x keys
+        model = IsolationForest(n_estimators=self.n_estimators, random_state=0).fit(samples)
+        latest = z[eligible, :, last[eligible]]  # hosts x keys
+        scores = -model.score_samples(latest)
+
+        found = []
+        for i in np.flatnonzero(scores > self.threshold):
+            h = eligible[i]
+            # Attribute the outlier to the metric that deviates most, among
+            # the host's series with a value at that time
+            measured = (series_row[h] >= 0) & ~np.isnan(cube[h, :, last[h]])
+            if not measured.any():
+                continue
+            k = int(np.argmax(np.where(measured, np.abs(latest[i]), -1.0)))
+            row = series_row[h, k]
+            found.append(
+                Detection(
+                    row, last[h], window.values[row, last[h]],
+                    f"isolation_forest (score={scores[i]:.3f}, z={latest[i, k]:.1f})",
+                )
+            )
+        return found
+
+
+DETECTORS: dict[str, type[Detector]] = {
+    cls.name: cls for cls in (ThreeSigmaDetector, MADDetector, SeasonalDetector, IsolationForestDetector)
+}
+
+
+def parse_algorithms(spec: str) -> list[tuple[str, str]]:
+    """``"pattern=algo;..."`` -> [(pattern, algo)], defaulting to three_sigma."""
+    rules = []
+    for part in spec.split(";"):
+        if not part.strip():
+            continue
+        pattern, _, algo = part.rpartition("=")
+        algo = algo.strip()
+        if algo not in DETECTORS:
+            raise ValueError(f"unknown anomaly algorithm {algo!r}")
+        rules.append((pattern.strip() or "*", algo))
+    rules.append(("*", ThreeSigmaDetector.name))
+    return rules
+
+
+def load_window(conn, lookback: timedelta, resolution: int, now: datetime | None = None) -> SeriesWindow:
+    """Load every series of the last *lookback* as a (series x bucket) array of
+    bucket averages. Uses a rollup tier of the same resolution when there is one."""
+    now = now or datetime.now(timezone.utc)
+    since = now - lookback
+    tier = next((t for t in available_tiers() if t.seconds == resolution), None)
+    if tier is not None:
+        t = rollup_tables[tier.name].c
+        stmt = select(t.series_id, func.extract("epoch", t.bucket).label("b"), t.value_avg.label("v")).where(
+            t.bucket >= since
+        )
+    else:
+        m = metrics_table.c
+        bucket = func.floor(func.extract("epoch", m.timestamp) / resolution) * resolution
+        stmt = (
+            select(m.series_id, bucket.label("b"), func.avg(m.value).label("v"))
+            .where(m.timestamp >= since)
+            .group_by(m.series_id, bucket)
+        )
+    df = pd.DataFrame(conn.execute(stmt).all(), columns=["series_id", "b", "v"])
+
+    start = int(since.timestamp()) // resolution * resolution
+    n_cols = int(now.timestamp()) // resolution * resolution
+    n_cols = (n_cols - start) // resolution + 1
+    times = (start + resolution * np.arange(n_cols)).astype("datetime64[s]")
+    if df.empty:
+        return SeriesWindow([], times, np.empty((0, n_cols)))
+
+    codes, uniques = pd.factorize(df["series_id"])
+    cols = ((df["b"].astype(np.int64) - start) // resolution).to_numpy()
+    ok = (cols >= 0) & (cols < n_cols)
+    values = np.full((len(uniques), n_cols), np.nan)
+    values[codes[ok], cols[ok]] = df["v"].to_numpy(dtype=np.float64)[ok]
+    keys = series_cache.keys(uniques.tolist())
+    known = [i for i, k in enumerate(keys) if k is not None]  # rows of deleted series are dropped
+    return SeriesWindow([keys[i] for i in known], times, values[known])
+
+
+class AnomalyEngine:
+    """Runs the configured detectors over all series and returns anomaly rows."""
+
+    def __init__(self, spec: str = ANOMALY_ALGORITHMS):
+        self.rules = parse_algorithms(spec)
+        self.detectors = {name: DETECTORS[name]() for _, name in self.rules}
+
+    def algorithm_for(self, item_key: str) -> str:
+        return next(algo for pattern, algo in self.rules if glob_match(item_key, pattern))
+
+    def run(self, conn, skip: set[tuple[str, str]] = frozenset()) -> list[dict]:
+        """Detect anomalies in the current data, ignoring series in *skip*."""
+        by_shape: dict[tuple[timedelta, int], list[Detector]] = {}
+        for det in self.detectors.values():
+            by_shape.setdefault((det.lookback, det.resolution), []).append(det)
+
+        found = []
+        for (lookback, resolution), detectors in by_shape.items():
+            window = load_window(conn, lookback, resolution)
+            algos = np.array([self.algorithm_for(key) for _, key in window.keys])
+            for det in detectors:
+                rows = np.flatnonzero(algos == det.name)
+                if not len(rows):
+                    continue
+                for d in det.detect(window, rows):
+                    host_id, item_key = window.keys[d.row]
+                    if (host_id, item_key) in skip:
+                        continue
+                    found.append(
+                        {
+                            "host_id": host_id,
+                            "item_key": item_key,
+                            "value": float(d.value),
+                            "timestamp": window.times[d.column].item().replace(tzinfo=timezone.utc),
+                            "reason": d.reason,
+                        }
+                    )
+        return found
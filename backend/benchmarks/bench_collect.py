@@ -0,0 +1,49 @@
+"""Benchmark one collection cycle, per-host vs batched ``item.get``.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_collect [--sizes 10,1000,10000] [--batch 500]
+
+Only the Zabbix fetch is measured; nothing is written to the database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_zabbix import FakeZabbix, serve, url_for
+from collector import ZabbixAPI, collect_rows
+
+
+def run_cycle(fake: FakeZabbix, url: str, batch_size: int) -> tuple[float, int, int]:
+    api = ZabbixAPI(url)
+    api.login()
+    fake.reset_counters()
+    start = time.perf_counter()
+    hosts = api.host_get()
+    rows = collect_rows(api, hosts, datetime.now(timezone.utc), batch_size=batch_size)
+    return time.perf_counter() - start, fake.requests, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'hosts':>7} {'mode':>10} {'cycle_s':>9} {'requests':>9} {'rows':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        fake = FakeZabbix(n)
+        server = serve(fake)
+        try:
+            for mode, batch in (("per-host", 0), ("batched", args.batch)):
+                elapsed, requests, rows = run_cycle(fake, url_for(server), batch)
+                print(f"{n:>7} {mode:>10} {elapsed:>9.3f} {requests:>9} {rows:>8}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Stand-in Zabbix JSON-RPC server for local benchmarks and development.
+
+Serves a synthetic fleet of hosts that all expose the collector's
+``METRIC_KEYS``, with one history sample per item every ``step`` seconds. Run standalone with::
+
+    python -m benchmarks.fake_zabbix --hosts 1000 --port 8089
+
+and point ``ZABBIX_API_URL`` at ``http://127.0.0.1:8089/api_jsonrpc.php``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from collector import METRIC_KEYS
+
+
+class FakeZabbix:
+    """In-memory fleet plus the JSON-RPC method handlers."""
+
+    def __init__(self, n_hosts: int, keys: list[str] = METRIC_KEYS, seed: int = 0, step: int = 60):
+        rnd = random.Random(seed)
+        self.keys = list(keys)
+        self.step = step
+        # Every 50th host is unreachable, every 25th has an open problem
+        self.hosts = [
+            {
+                "hostid": str(10000 + i), "host": f"host-{i}", "name": f"Host {i}", "status": "0",
+                "interfaces": [{"type": "1", "available": "2" if i % 50 == 49 else "1", "error": ""}],
+            }
+            for i in range(n_hosts)
+        ]
+        self.itemids = {
+            (h["hostid"], k): str(100000 + i * len(self.keys) + j)
+            for i, h in enumerate(self.hosts)
+            for j, k in enumerate(self.keys)
+        }
+        self.items = {itemid: key for key, itemid in self.itemids.items()}
+        self.values = {key: round(rnd.uniform(0, 100), 2) for key in self.itemids}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def sample(self, itemid: str, clock: int) -> float:
+        """Deterministic history value of *itemid* at *clock*."""
+        return round(self.values[self.items[itemid]] + (clock // self.step) % 7, 2)
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+
+    def handle(self, method: str, params: dict):
+        with self._lock:
+            self.requests += 1
+        handler = getattr(self, "rpc_" + method.replace(".", "_"), None)
+        if handler is None:
+            raise ValueError(f"unsupported method {method}")
+        return handler(params)
+
+    def rpc_user_login(self, params):
+        return "fake-token"
+
+    def rpc_host_get(self, params):
+        return self.hosts
+
+    def rpc_item_get(self, params):
+        host_ids = params.get("hostids") or [h["hostid"] for h in self.hosts]
+        keys = params.get("filter", {}).get("key_") or self.keys
+        lastclock = int(time.time()) // self.step * self.step
+        return [
+            {
+                "itemid": self.itemids[(hid, k)],
+                "hostid": hid,
+                "key_": k,
+                "value_type": "0",
+                "lastclock": str(lastclock),
+                "lastns": "0",
+                "lastvalue": str(self.sample(self.itemids[(hid, k)], lastclock)),
+            }
+            for hid in host_ids
+            for k in keys
+            if (hid, k) in self.itemids
+        ]
+
+    def _clocks(self, params):
+        first = -(-int(params["time_from"]) // self.step) * self.step
+        last = min(int(params["time_till"]), int(time.time()))
+        return range(first, last + 1, self.step)
+
+    def rpc_history_get(self, params):
+        return [
+            {"itemid": itemid, "clock": str(clock), "ns": "0", "value": str(self.sample(itemid, clock))}
+            for clock in self._clocks(params)
+            for itemid in params["itemids"]
+        ]
+
+    def rpc_trend_get(self, params):
+        params = dict(params, time_from=-(-int(params["time_from"]) // 3600) * 3600)
+        return [
+            {"itemid": itemid, "clock": str(clock), "value_avg": str(self.sample(itemid, clock))}
+            for clock in self._clocks(params)
+            if clock % 3600 == 0
+            for itemid in params["itemids"]
+        ]
+
+    def rpc_trigger_get(self, params):
+        return [
+            {
+                "triggerid": str(20000 + i), "description": f"High CPU utilization on {h['host']}",
+                "priority": "3", "hosts": [{"hostid": h["hostid"], "host": h["host"]}],
+            }
+            for i, h in enumerate(self.hosts)
+            if i % 25 == 0
+        ]
+
+
+def serve(fake: FakeZabbix, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start *fake* on a background thread and return the running server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # keep-alive clients otherwise stall on delayed ACKs
+
+        def do_POST(self):  # noqa: N802
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            try:
+                reply = {"jsonrpc": "2.0", "result": fake.handle(body["method"], body.get("params", {})), "id": body.get("id")}
+            except Exception as exc:  # noqa: BLE001
+                reply = {"jsonrpc": "2.0", "error": {"code": -32602, "message": "Invalid params.", "data": str(exc)}, "id": body.get("id")}
+            data = json.dumps(reply).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url_for(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/api_jsonrpc.php"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    srv = serve(FakeZabbix(args.hosts), "0.0.0.0", args.port)
+    print(f"[FakeZabbix] {args.hosts} host(s) on {url_for(srv)}")
+    threading.Event().wait()
@@ -3,26 +3,27 @@
 
    NOTE: This is a minimal first-cut implementation aimed at providing a working
    data-collection pipeline for the MVP. The logic can be optimized and
-   hardened later (pagination, error back-off, async HTTP, etc.).
+   hardened later (pagination, error back-off, etc.).
 """
 
 from __future__ import annotations
 
-import json
 import os
+import re
 import threading
 import time
 from datetime import datetime, timezone
 from typing import List
 
-import requests
-from sqlalchemy import insert
-
-from database import engine, init_db, metrics_table
-
-ZABBIX_API_URL = os.getenv("ZABBIX_API_URL", "http://zabbix-server/api_jsonrpc.php")
-ZABBIX_USER = os.getenv("ZABBIX_USER", "Admin")
-ZABBIX_PASSWORD = os.getenv("ZABBIX_PASSWORD", "zabbix")
+from anomaly_detector import ANOMALY_MODE
+from database import init_db
+from incremental import HistoryTracker
+from inventory import HostInventory, host_inventory
+from ingest import MetricWriter
+from pipeline import CollectorPipeline
+from sharding import ShardLease
+from stream_detector import StreamingDetector
+from zabbix_api import ZabbixAPI  # noqa: F401  (re-exported for existing imports)
 
 # Comma-separated list of item keys to collect. Extend as needed.
 DEFAULT_KEYS = (
@@ -32,140 +33,119 @@ METRIC_KEYS: List[str] = [k.strip() for k in os.getenv("METRIC_KEYS", DEFAULT_KE
 
 COLLECT_INTERVAL = int(os.getenv("COLLECT_INTERVAL", "60"))  # seconds
 
+# Number of hosts per item.get call. 0 falls back to one call per host.
+ITEM_BATCH_SIZE = int(os.getenv("ITEM_BATCH_SIZE", "500"))
 
-class ZabbixAPI:
-    """Minimal Zabbix API wrapper (JSON-RPC 2.0)."""
-
-    def __init__(self):
-        self.auth_token: str | None = None
-
-    def _request(self, method: str, params: dict, auth: bool = True):
-        payload = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params,
-            "id": 1,
-        }
-        if auth and self.auth_token:
-            payload["auth"] = self.auth_token
-        headers = {"Content-Type": "application/json"}
-        resp = requests.post(ZABBIX_API_URL, headers=headers, json=payload, timeout=15)
-        resp.raise_for_status()
-        res = resp.json()
-        if "error" in res:
-            raise RuntimeError(res["error"])
-        return res["result"]
-
-    def login(self):
-        self.auth_token = self._request(
-            "user.login", {"user": ZABBIX_USER, "password": ZABBIX_PASSWORD}, auth=False
-        )
+# "lastvalue": store each item's latest value stamped with the cycle time.
+# "incremental": store every new history sample since the last cycle (incremental.py).
+COLLECT_MODE = os.getenv("COLLECT_MODE", "lastvalue")
 
-    def host_get(self):
-        # Request both technical host ("host") and visible name ("name")
-        return self._request("host.get", {"output": ["hostid", "host", "name"]}, auth=True)
-
-    def item_get(self, host_id, keys):
-        return self._request(
-            "item.get",
-            {
-                "output": ["key_", "lastvalue"],
-                "hostids": [host_id],
-                "filter": {"key_": keys},
-                "sortfield": "name",
-            },
-            auth=True,
-        )
-
-    def problem_get(self):
-        return self._request(
-            "trigger.get",
-            {
-                "output": ["triggerid", "description", "priority"],
-                "filter": {"value": 1},  # 1 = Problem state
-                "selectHosts": ["host"],
-                "expandDescription": 1,
-                "sortfield": "lastchange",
-                "sortorder": "DESC",
-            },
-            auth=True,
-        )
-
-    def get_problem_by_id(self, trigger_id: str):
-        return self._request(
-            "trigger.get",
-            {
-                "output": ["triggerid", "description", "priority"],
-                "triggerids": [trigger_id],
-                "selectHosts": ["host"],
-                "expandDescription": 1,
-            },
-            auth=True,
-        )
-
-    def execute_script(self, script_id: str, host_id: str):
-        """Executes a script on a given host."""
-        return self._request(
-            "script.execute",
-            {
-                "scriptid": script_id,
-                "hostid": host_id,
-            },
-            auth=True,
-        )
+_NUMERIC_RE = re.compile(r"[-+]?[0-9]*\.?[0-9]+")
 
 
 class ZabbixCollector(threading.Thread):
     """Collect metrics from Zabbix periodically."""
 
-    def __init__(self):
+    def __init__(self, api: ZabbixAPI | None = None, lease: ShardLease | None = None):
         super().__init__(daemon=True)
         init_db()
-        self.api = ZabbixAPI()
+        self.api = api or ZabbixAPI()
+        # Hosts come from the cached inventory, not a host.get per cycle
+        self.inventory = host_inventory if api is None else HostInventory(api)
+        # Only hosts of the shards this instance holds are collected (collector_main.py)
+        self.lease = lease
         self._stop_event = threading.Event()
+        self.tracker = HistoryTracker() if COLLECT_MODE == "incremental" else None
+        self.writer = MetricWriter()
+        if self.tracker is not None:
+            # History marks only move past samples that are committed
+            self.writer.subscribe(self.tracker.committed)
+        self.detector: StreamingDetector | None = None
+        if ANOMALY_MODE == "stream":
+            self.detector = StreamingDetector()
+            self.detector.warm_up()
+        # Writes (and streaming detection) run on the pipeline's writer threads
+        self.pipeline = CollectorPipeline(self.writer, self.detector)
 
     def stop(self):
         self._stop_event.set()
 
     def run(self):
+        self.inventory.start()
+        self.pipeline.start()
         while not self._stop_event.is_set():
             try:
-                if not self.api.auth_token:
-                    self.api.login()
                 self.collect_once()
             except Exception as exc:  # noqa: BLE001
                 print(f"[Collector] error: {exc}")
-                # Force re-login next loop
-                self.api.auth_token = None
             finally:
                 self._stop_event.wait(COLLECT_INTERVAL)
+        self.pipeline.close()
+        if self.lease is not None:
+            self.lease.release()
 
     def collect_once(self):
-        hosts = self.api.host_get()
+        start = time.monotonic()
+        hosts = self.inventory.hosts()
+        if self.lease is not None:
+            owned = self.lease.owned
+            if self.lease.renew() != owned and self.tracker is not None:
+                self.tracker.forget()  # marks of re-acquired hosts may be stale
+            hosts = self.lease.filter_hosts(hosts)
         now = datetime.now(timezone.utc)
-        rows = []
         print(f"[Collector] found {len(hosts)} host(s) to collect data from")
-        for host in hosts:
-            host_id = host["hostid"]
-            items = self.api.item_get(host_id, METRIC_KEYS)
-            print(f"[Collector] host {host_id} has {len(items)} matching item(s)")
-            for item in items:
-                raw_val = str(item.get("lastvalue", "")).strip()
-                # extract leading numeric part, allow decimals
-                import re
-                m = re.match(r"[-+]?[0-9]*\.?[0-9]+", raw_val)
-                if not m:
-                    continue  # skip non-numeric
-                value = float(m.group(0))
-                rows.append(
-                    {
-                        "host_id": host_id,
-                        "item_key": item["key_"],
-                        "value": value,
-                        "timestamp": now,
-                    }
-                )
+        if self.tracker is not None:
+            rows = self.tracker.collect(self.api, fetch_items(self.api, hosts), now.timestamp())
+        else:
+            rows = collect_rows(self.api, hosts, now)
+        self.pipeline.record("fetch", time.monotonic() - start)
         if rows:
-            with engine.begin() as conn:
-                conn.execute(insert(metrics_table), rows)
-            print(f"[Collector] inserted {len(rows)} rows @ {now.isoformat()}")
+            self.pipeline.submit(rows)
+            print(f"[Collector] queued {len(rows)} rows @ {now.isoformat()}")
+
+
+def _parse_value(raw) -> float | None:
+    """Extract the leading numeric part of an item's ``lastvalue``."""
+    m = _NUMERIC_RE.match(str(raw if raw is not None else "").strip())
+    return float(m.group(0)) if m else None
+
+
+def fetch_items(api: ZabbixAPI, hosts: list[dict], batch_size: int = ITEM_BATCH_SIZE) -> list[dict]:
+    """All ``METRIC_KEYS`` items of *hosts*, each carrying its ``hostid``.
+
+    With ``batch_size > 0`` items are requested for up to *batch_size* hosts per
+    ``item.get`` call; otherwise one call is made per host. Calls run
+    concurrently through ``ZabbixAPI.map``.
+    """
+    host_ids = [h["hostid"] for h in hosts]
+    items: list[dict] = []
+    if batch_size > 0:
+        chunks = [host_ids[i:i + batch_size] for i in range(0, len(host_ids), batch_size)]
+        for chunk_items in api.map(lambda chunk: api.item_get_many(chunk, METRIC_KEYS), chunks):
+            items.extend(chunk_items)
+    else:
+        per_host = api.map(lambda host_id: api.item_get(host_id, METRIC_KEYS), host_ids)
+        for host_id, host_items in zip(host_ids, per_host):
+            for item in host_items:
+                item["hostid"] = host_id
+                items.append(item)
+    return items
+
+
+def collect_rows(api: ZabbixAPI, hosts: list[dict], now: datetime,
+                 batch_size: int = ITEM_BATCH_SIZE) -> list[dict]:
+    """Fetch the latest value of every ``METRIC_KEYS`` item for *hosts*."""
+    rows = []
+    for item in fetch_items(api, hosts, batch_size):
+        value = _parse_value(item.get("lastvalue"))
+        if value is None:
+            continue  # skip non-numeric
+        rows.append(
+            {
+                "host_id": item["hostid"],
+                "item_key": item["key_"],
+                "value": value,
+                "timestamp": now,
+            }
+        )
+    return rows
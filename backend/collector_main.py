@@ -0,0 +1,60 @@
+"""Standalone collector process, for running collection outside the API.
+
+Usage (from ``backend/``)::
+
+    COLLECTOR_SHARDS=4 python collector_main.py [--instance NAME] [--zabbix-url URL]
+
+Start as many processes (or containers / nodes) as needed against the same
+database; they split the hosts between them through ``sharding.ShardLease``.
+Run the API with ``EMBEDDED_COLLECTOR=0`` so it does not collect as well.
+SIGTERM / SIGINT stop the collector cleanly: queued rows are written and the
+shard leases are released for the remaining instances. With ``REDIS_URL``
+set, writes also move the epochs of the API's shared response cache on.
+
+Against the fake Zabbix server::
+
+    python -m benchmarks.fake_zabbix --hosts 1000 --port 8089 &
+    python collector_main.py --zabbix-url http://127.0.0.1:8089/api_jsonrpc.php
+"""
+
+from __future__ import annotations
+
+import argparse
+import signal
+
+from anomaly_detector import subscribe_anomalies
+from collector import ZabbixCollector
+from response_cache import REDIS_URL, response_cache
+from sharding import COLLECTOR_LEASE_TTL, COLLECTOR_SHARDS, ShardLease, default_instance
+from zabbix_api import ZABBIX_API_URL, ZabbixAPI
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, default=COLLECTOR_SHARDS)
+    parser.add_argument("--instance", default=default_instance())
+    parser.add_argument("--lease-ttl", type=int, default=COLLECTOR_LEASE_TTL)
+    parser.add_argument("--zabbix-url", default=ZABBIX_API_URL)
+    args = parser.parse_args()
+
+    lease = ShardLease(args.shards, args.instance, args.lease_ttl)
+    collector = ZabbixCollector(api=ZabbixAPI(args.zabbix_url), lease=lease)
+    if REDIS_URL:  # invalidate the API workers' cached responses
+        collector.writer.subscribe(lambda rows: response_cache.bump("metrics"))
+        subscribe_anomalies(lambda stored: response_cache.bump("anomalies"))
+
+    def _stop(signum, _frame):
+        print(f"[Collector] {signal.Signals(signum).name} received, stopping...")
+        collector.stop()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    print(f"[Collector] instance {lease.instance} starting ({args.shards} shards)")
+    collector.start()
+    while collector.is_alive():
+        collector.join(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Shape-preserving downsampling of time series (Largest-Triangle-Three-Buckets)."""
+
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Return the indices of the *n_out* points LTTB keeps from ``(x, y)``.
+
+    *x* must be increasing. The first and last points are always kept; every
+    bucket in between contributes the point forming the largest triangle with
+    the previously kept point and the average of the next bucket. All per-bucket
+    terms are precomputed as padded 2-D arrays so the sequential pass only does
+    one fused row operation per bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets over the inner points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, counts = edges[:-1], np.diff(edges)
+
+    # Averages of each bucket; bucket i looks ahead to the average of i + 1,
+    # the last bucket to the final point.
+    avg_x = np.add.reduceat(x[: n - 1], starts) / counts
+    avg_y = np.add.reduceat(y[: n - 1], starts) / counts
+    cx = np.append(avg_x[1:], x[-1])[:, None]
+    cy = np.append(avg_y[1:], y[-1])[:, None]
+
+    # Padded (bucket, offset) view of the candidates; padding repeats the
+    # bucket's first point so it can never win over it.
+    offsets = np.arange(counts.max())
+    idx = starts[:, None] + np.where(offsets < counts[:, None], offsets, 0)
+    bx, by = x[idx], y[idx]
+
+    # Twice the triangle area for a kept point (ax, ay) is
+    # |ax * A + ay * B + C| with the terms below.
+    a_term = by - cy
+    b_term = cx - bx
+    c_term = bx * cy - cx * by
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for i in range(len(starts)):
+        j = int(np.argmax(np.abs(ax * a_term[i] + ay * b_term[i] + c_term[i])))
+        k = idx[i, j]
+        out[i + 1] = k
+        ax, ay = x[k], y[k]
+    return out
+
+
+def downsample_indices(
+    x: Sequence[float], columns: Iterable[Sequence[float | None]], max_points: int
+) -> np.ndarray:
+    """Indices of the rows to keep so that every series in *columns* keeps its
+    shape and at most *max_points* rows remain.
+
+    Each non-empty series gets an equal share of the budget; the union of the
+    points LTTB picks for each is returned in order. Missing values are filled
+    with the series mean. When a share would be below the 3 points LTTB
+    needs, *max_points* evenly spaced rows are returned instead.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    series = []
+    for col in columns:
+        y = np.array([np.nan if v is None else v for v in col], dtype=np.float64)
+        mask = np.isnan(y)
+        if mask.all():
+            continue
+        y[mask] = np.nanmean(y)
+        series.append(y)
+    xs = np.asarray(x, dtype=np.float64)
+    share = max_points // len(series) if series else 0
+    if share < 3:
+        return np.linspace(0, n - 1, max_points).astype(np.int64)
+    return np.unique(np.concatenate([lttb_indices(xs, y, share) for y in series]))
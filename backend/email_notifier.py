@@ -1,11 +1,11 @@
 import os
+import queue
 import smtplib
 import time
 from email.mime.text import MIMEText
 from threading import Thread
-from typing import Dict
 
-from collector import ZabbixAPI
+from alerts import AlertDiff, AlertPoller, alert_poller
 
 class EmailNotifier(Thread):
     def __init__(
@@ -15,12 +15,15 @@ class EmailNotifier(Thread):
         smtp_user,
         smtp_password,
         recipients,
-        interval_seconds=60,
+        poller: AlertPoller = alert_poller,
     ):
         super().__init__()
         self.daemon = True
-        self.interval_seconds = interval_seconds
-        self.active_triggers: Dict[str, Dict] = {}
+        # Problem changes arrive as diffs from the shared poller; subscribing
+        # here queues the ones published during the startup delay too
+        self.poller = poller
+        self._diffs: "queue.Queue[AlertDiff]" = queue.Queue()
+        self.poller.subscribe(self._diffs.put)
 
         # Store email config
         self.smtp_host = smtp_host
@@ -35,41 +38,21 @@ class EmailNotifier(Thread):
         time.sleep(30)
         print("[EmailNotifier] Service started.")
 
+        self.poller.start()
         while True:
+            diff = self._diffs.get()
             try:
-                self.check_and_notify()
+                self.notify(diff)
             except Exception as e:
                 print(f"[EmailNotifier] Error during check cycle: {e}")
-            time.sleep(self.interval_seconds)
 
-    def check_and_notify(self):
-        api = ZabbixAPI()
-        api.login()
-
-        # This method gets active triggers (value=1)
-        current_triggers_list = api.problem_get()
-        current_triggers_map = {t["triggerid"]: t for t in current_triggers_list}
-
-        current_ids = set(current_triggers_map.keys())
-        previous_ids = set(self.active_triggers.keys())
-
-        # Identify new problems
-        new_ids = current_ids - previous_ids
-        for trigger_id in new_ids:
-            trigger = current_triggers_map[trigger_id]
+    def notify(self, diff: AlertDiff):
+        """Send PROBLEM mails for new problems and OK mails for resolved ones."""
+        for trigger in diff.new:
             self.send_notification(trigger, "PROBLEM")
-
-        # Identify resolved problems
-        resolved_ids = previous_ids - current_ids
-        for trigger_id in resolved_ids:
-            trigger = self.active_triggers[
-                trigger_id
-            ]  # Get data from the old state
+        for trigger in diff.resolved:
             self.send_notification(trigger, "OK")
 
-        # Update state for the next cycle
-        self.active_triggers = current_triggers_map
-
     def send_notification(self, trigger, status):
         if not all(
             [
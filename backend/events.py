@@ -0,0 +1,141 @@
+"""Fan-out hub for the dashboard's Server-Sent Events stream.
+
+Producers (the metric writer, the alert poller and the anomaly
+detectors) call ``event_hub.publish`` from their own threads. Each event is
+serialized once into an SSE frame and the same bytes are handed to every
+subscriber whose event-type and host filters match; events without a host
+go to every subscriber of that type.
+Subscribers are ``/api/events`` connections, each with a bounded
+``asyncio.Queue`` on the server's event loop. A client that falls
+``EVENTS_QUEUE_SIZE`` frames behind is disconnected instead of buffering
+without limit; ``EventSource`` reconnects by itself and the dashboard
+reloads its data on (re)connect.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Iterable
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))  # frames per client
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))  # seconds between keep-alive comments
+EVENTS_RETRY_MS = 5000  # reconnect delay advertised to EventSource
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(kind: str, data, event_id: int | None = None) -> bytes:
+    """One SSE frame (``id`` / ``event`` / ``data`` lines)."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    body = json.dumps(data, default=_default, separators=(",", ":"))
+    return f"{head}event: {kind}\ndata: {body}\n\n".encode()
+
+
+class Subscriber:
+    """One connected client: its filters and pending frames."""
+
+    def __init__(self, kinds: Iterable[str] | None, hosts: Iterable[str] | None, queue_size: int):
+        self.kinds = frozenset(kinds) if kinds else None  # None: every event type
+        self.hosts = frozenset(hosts) if hosts else None  # None: every host
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.overflowed = False
+
+    def wants(self, kind: str, host_id: str | None) -> bool:
+        if self.kinds is not None and kind not in self.kinds:
+            return False
+        return host_id is None or self.hosts is None or host_id in self.hosts
+
+    def _offer(self, frame: bytes):
+        """Queue *frame*; runs on the subscriber's event loop."""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too slow: drop what is pending and end the stream
+            self.closed = self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def frames(self, heartbeat: float = EVENTS_HEARTBEAT):
+        """Frames for the response body, with keep-alive comments while idle."""
+        yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_FRAME
+                continue
+            if frame is None:
+                return
+            yield frame
+
+
+class EventHub:
+    """Serializes each event once and fans it out to matching subscribers."""
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._counts = {"published": 0, "delivered": 0, "dropped_clients": 0}
+
+    def subscribe(self, kinds: Iterable[str] | None = None, hosts: Iterable[str] | None = None) -> Subscriber:
+        """Register a client; must be called on the event loop serving it."""
+        sub = Subscriber(kinds, hosts, self.queue_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        sub.closed = True
+        with self._lock:
+            self._subscribers.discard(sub)
+            if sub.overflowed:
+                self._counts["dropped_clients"] += 1
+
+    def wants(self, kind: str, host_id: str | None = None) -> bool:
+        """Whether any client would receive a *kind* event for *host_id*, so
+        producers can skip building payloads nobody reads."""
+        with self._lock:
+            return any(s.wants(kind, host_id) for s in self._subscribers)
+
+    def publish(self, kind: str, data, host_id: str | None = None) -> int:
+        """Send an event to the matching clients; safe from any thread.
+        Returns the number of clients it was queued for."""
+        with self._lock:
+            targets = [s for s in self._subscribers if not s.closed and s.wants(kind, host_id)]
+            if not targets:
+                return 0
+            event_id = next(self._ids)
+            self._counts["published"] += 1
+            self._counts["delivered"] += len(targets)
+        frame = encode(kind, data, event_id)
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, frame)  # noqa: SLF001
+            except RuntimeError:  # event loop already closed
+                sub.closed = True
+        return len(targets)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "queue_size": self.queue_size, **self._counts}
+
+
+event_hub = EventHub()
@@ -0,0 +1,193 @@
+"""Incremental collection from Zabbix history instead of ``lastvalue`` snapshots.
+
+A high-water mark (the ``(clock, ns)`` of the newest stored sample) is kept
+per item. Each cycle only items whose latest value moved past their mark are
+fetched, through ``history.get`` (or ``trend.get`` hourly averages for
+windows older than ``ZABBIX_HISTORY_DAYS``) in batches of itemids and
+bounded time windows.
+
+A mark only moves once the writer has committed the samples
+(``committed``, subscribed to ``MetricWriter``); batches the pipeline
+drops, rows the writer gives up on and rows still queued when the process
+dies are fetched again from the old mark on a later cycle. Samples still in
+flight when the next cycle starts are fetched twice; the insert's ``ON
+CONFLICT DO NOTHING`` keeps them once. Marks are seeded from the
+``last_seen`` of the series catalog on start, so a collector outage is
+backfilled (up to ``BACKFILL_MAX``) on the next cycles: each cycle fetches
+at most ``BACKFILL_CHUNKS_PER_CYCLE`` windows per batch and the marks carry
+the rest of the gap to the following cycles.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from database import engine, series_table
+from zabbix_api import ZabbixAPI
+
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "500"))  # itemids per history.get
+BACKFILL_CHUNK = int(os.getenv("BACKFILL_CHUNK", "3600"))  # seconds per history.get window
+BACKFILL_CHUNKS_PER_CYCLE = int(os.getenv("BACKFILL_CHUNKS_PER_CYCLE", "24"))  # windows per batch and cycle
+BACKFILL_MAX = int(os.getenv("BACKFILL_MAX", str(30 * 86400)))  # oldest gap worth backfilling
+ZABBIX_HISTORY_DAYS = int(os.getenv("ZABBIX_HISTORY_DAYS", "7"))  # older windows use trend.get
+
+# Zabbix value_type -> history table; only numeric items are collected
+NUMERIC_VALUE_TYPES = {"0": 0, "3": 3}  # float, unsigned
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+Mark = tuple[int, int]  # (clock, ns)
+
+
+def sample_mark(clock: int, ns: int) -> Mark:
+    """*clock*, *ns* at the microsecond precision timestamps are stored with."""
+    return clock, ns - ns % 1000
+
+
+def stored_mark(ts: datetime) -> Mark:
+    delta = ts - EPOCH
+    return delta.days * 86400 + delta.seconds, delta.microseconds * 1000
+
+
+def sample_time(clock: int, ns: int) -> datetime:
+    return EPOCH + timedelta(seconds=clock, microseconds=ns // 1000)
+
+
+class HistoryTracker:
+    """Per-item high-water marks and the history fetches that advance them."""
+
+    def __init__(self):
+        self.marks: dict[str, Mark] = {}  # itemid -> newest (clock, ns) stored
+        self._itemids: dict[tuple[str, str], str] = {}  # (host_id, item_key) -> itemid
+        self._seed: dict[tuple[str, str], Mark] | None = None
+        self._lock = threading.Lock()  # marks move on writer threads too
+
+    def _stored_marks(self) -> dict[tuple[str, str], Mark]:
+        """Newest stored timestamp per series within the backfill horizon."""
+        s = series_table.c
+        since = datetime.now(timezone.utc) - timedelta(seconds=BACKFILL_MAX)
+        stmt = select(s.host_id, s.item_key, s.last_seen).where(s.last_seen >= since)
+        with engine.connect() as conn:
+            return {(h, k): stored_mark(ts) for h, k, ts in conn.execute(stmt)}
+
+    def forget(self):
+        """Drop all marks; they are re-seeded from the series catalog."""
+        with self._lock:
+            self.marks.clear()
+            self._seed = None
+
+    def _advance(self, newest: dict[str, Mark]):
+        with self._lock:
+            for itemid, mark in newest.items():
+                if mark > self.marks.get(itemid, (-1, 0)):
+                    self.marks[itemid] = mark
+
+    def committed(self, rows: list[dict]):
+        """Advance the marks past *rows* once they are stored."""
+        newest: dict[str, Mark] = {}
+        for r in rows:
+            itemid = self._itemids.get((r["host_id"], r["item_key"]))
+            if itemid is not None:
+                mark = stored_mark(r["timestamp"])
+                if mark > newest.get(itemid, (-1, 0)):
+                    newest[itemid] = mark
+        self._advance(newest)
+
+    def _mark(self, item: dict) -> Mark:
+        itemid = item["itemid"]
+        self._itemids[(item["hostid"], item["key_"])] = itemid
+        if itemid not in self.marks:
+            if self._seed is None:
+                self._seed = self._stored_marks()
+            stored = self._seed.get((item["hostid"], item["key_"]))
+            # Never-stored items start with their latest value only
+            self.marks[itemid] = stored if stored is not None else (int(item.get("lastclock") or 0), -1)
+        return self.marks[itemid]
+
+    def collect(self, api: ZabbixAPI, items: list[dict], now: float | None = None) -> list[dict]:
+        """Fetch the samples newer than their item's mark, at most
+        ``BACKFILL_CHUNKS_PER_CYCLE`` windows per batch; returns metric rows
+        ordered by timestamp. The marks move in ``committed``."""
+        now = int(now or time.time())
+        horizon = now - BACKFILL_MAX
+        by_id = {}
+        pending: dict[int, list[str]] = {}
+        for item in items:
+            history = NUMERIC_VALUE_TYPES.get(str(item.get("value_type")))
+            if history is None:
+                continue
+            mark = self._mark(item)
+            if sample_mark(int(item.get("lastclock") or 0), int(item.get("lastns") or 0)) <= mark:
+                continue  # nothing new since the last cycle
+            by_id[item["itemid"]] = item
+            pending.setdefault(history, []).append(item["itemid"])
+
+        with self._lock:
+            marks = {itemid: self.marks[itemid] for itemid in by_id}
+
+        # Batch items whose marks lie within one window of each other, so
+        # they share time windows without re-fetching much stored data.
+        # Windows start at the mark's second: later samples of it are new.
+        jobs = []
+        for history, ids in pending.items():
+            ids.sort(key=lambda i: marks[i])
+            batch: list[str] = []
+            for itemid in ids + [None]:
+                if batch and (
+                    itemid is None
+                    or len(batch) >= HISTORY_BATCH_SIZE
+                    or marks[itemid][0] - marks[batch[0]][0] > BACKFILL_CHUNK
+                ):
+                    jobs.append((history, batch, max(marks[batch[0]][0], horizon)))
+                    batch = []
+                if itemid is not None:
+                    batch.append(itemid)
+
+        def fetch(job):
+            """Samples of the job's windows and the last second they cover."""
+            history, batch, time_from = job
+            samples = []
+            for _ in range(BACKFILL_CHUNKS_PER_CYCLE):
+                if time_from > now:
+                    break
+                time_till = min(time_from + BACKFILL_CHUNK - 1, now)
+                if time_till < now - ZABBIX_HISTORY_DAYS * 86400:
+                    for t in api.trends_get(batch, time_from, time_till):
+                        samples.append((t["itemid"], int(t["clock"]), 0, t["value_avg"]))
+                else:
+                    for h in api.history_get(batch, history, time_from, time_till):
+                        samples.append((h["itemid"], int(h["clock"]), int(h.get("ns", 0)), h["value"]))
+                time_from = time_till + 1
+            return batch, samples, time_from - 1
+
+        rows = []
+        unfinished, quiet = 0, {}
+        for batch, samples, covered in api.map(fetch, jobs):
+            fresh = set()
+            for itemid, clock, ns, value in samples:
+                if sample_mark(clock, ns) <= marks[itemid]:
+                    continue
+                fresh.add(itemid)
+                item = by_id[itemid]
+                rows.append(
+                    {
+                        "host_id": item["hostid"],
+                        "item_key": item["key_"],
+                        "value": float(value),
+                        "timestamp": sample_time(clock, ns),
+                    }
+                )
+            if covered < now:
+                unfinished += len(batch)
+                # Items without samples in the windows fetched have nothing
+                # to commit; move them past those windows directly
+                quiet.update((itemid, (covered, 10**9)) for itemid in batch if itemid not in fresh)
+        self._advance(quiet)
+        if unfinished:
+            print(f"[HistoryTracker] backfill of {unfinished} items continues next cycle")
+        rows.sort(key=lambda r: r["timestamp"])
+        return rows
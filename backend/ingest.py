@@ -0,0 +1,252 @@
+"""Bulk ingest of metric rows.
+
+``MetricWriter`` buffers rows and flushes them when ``INGEST_FLUSH_ROWS`` rows
+are buffered or the oldest buffered row is ``INGEST_FLUSH_INTERVAL`` seconds
+old. A flush streams the rows with ``COPY FROM STDIN`` (CSV) into a temporary
+table and moves them over with one ``INSERT ... SELECT ... ON CONFLICT DO
+NOTHING``, so re-sent samples stay deduplicated. ``INGEST_METHOD=values``
+uses psycopg2 ``execute_values`` pages instead, ``insert`` the plain
+SQLAlchemy executemany.
+
+Every write path also advances ``first_seen`` / ``last_seen`` of the
+written series in the *series* catalog, in the same transaction.
+
+Failed flushes are retried with exponential backoff. Writers block while a
+flush is running (backpressure on a slow database); if the database stays
+unavailable the buffer is capped at ``INGEST_MAX_BUFFER`` rows by dropping
+the oldest ones.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+import time
+from typing import Callable
+
+from psycopg2.extras import execute_values
+from sqlalchemy import Table
+from sqlalchemy.dialects.postgresql import insert
+
+from database import engine, metrics_table
+from series import series_cache
+
+INGEST_METHOD = os.getenv("INGEST_METHOD", "copy")  # copy | values | insert
+INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", "50000"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0"))  # seconds; 0 = flush every write
+INGEST_MAX_BUFFER = int(os.getenv("INGEST_MAX_BUFFER", "1000000"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", "0.5"))  # doubled per attempt
+
+COLUMNS = ("series_id", "timestamp", "value")
+VALUES_PAGE_SIZE = 10000
+
+
+def series_ids(rows: list[dict]) -> list[int]:
+    """Series id of every row: its own ``series_id`` or the one resolved (and
+    created if new) from ``host_id`` / ``item_key``."""
+    if rows and "series_id" in rows[0]:
+        return [r["series_id"] for r in rows]
+    return series_cache.ids((r["host_id"], r["item_key"]) for r in rows)
+
+
+# Only rows whose range actually grows are touched; ordered by id so that
+# concurrent writers lock the series rows in the same order.
+_TOUCH_SERIES = (
+    "UPDATE series s SET first_seen = LEAST(s.first_seen, u.lo), last_seen = GREATEST(s.last_seen, u.hi) "
+    "FROM unnest(%(ids)s::int[], %(lo)s::timestamptz[], %(hi)s::timestamptz[]) AS u(id, lo, hi) "
+    "WHERE s.id = u.id AND (s.last_seen IS NULL OR u.hi > s.last_seen OR u.lo < s.first_seen)"
+)
+
+
+def _seen_ranges(ids: list[int], rows: list[dict]) -> dict:
+    """Parameters of ``_TOUCH_SERIES``: oldest and newest timestamp per series."""
+    ranges: dict[int, list] = {}
+    for series_id, r in zip(ids, rows):
+        ts = r["timestamp"]
+        seen = ranges.get(series_id)
+        if seen is None:
+            ranges[series_id] = [ts, ts]
+        elif ts < seen[0]:
+            seen[0] = ts
+        elif ts > seen[1]:
+            seen[1] = ts
+    ordered = sorted(ranges)
+    return {
+        "ids": ordered,
+        "lo": [ranges[i][0] for i in ordered],
+        "hi": [ranges[i][1] for i in ordered],
+    }
+
+
+def _csv_buffer(ids: list[int], rows: list[dict]) -> io.StringIO:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    stamps: dict = {}  # rows of a cycle share few timestamps; format each once
+    for series_id, r in zip(ids, rows):
+        ts = r["timestamp"]
+        iso = stamps.get(ts)
+        if iso is None:
+            iso = stamps[ts] = ts.isoformat()
+        writer.writerow((series_id, iso, r["value"]))
+    buf.seek(0)
+    return buf
+
+
+def copy_rows(rows: list[dict], table: Table = metrics_table) -> None:
+    """COPY *rows* into a temp table, then insert the new ones into *table*."""
+    cols = ", ".join(COLUMNS)
+    ids = series_ids(rows)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE ingest_stage (LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cur.copy_expert(f"COPY ingest_stage ({cols}) FROM STDIN WITH (FORMAT csv)", _csv_buffer(ids, rows))
+            cur.execute(f"INSERT INTO {table.name} ({cols}) SELECT {cols} FROM ingest_stage ON CONFLICT DO NOTHING")
+            cur.execute(_TOUCH_SERIES, _seen_ranges(ids, rows))
+        raw.commit()
+    except BaseException:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def values_rows(rows: list[dict], table: Table = metrics_table) -> None:
+    """Insert *rows* with multi-row VALUES pages (``execute_values``)."""
+    ids = series_ids(rows)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            execute_values(
+                cur,
+                f"INSERT INTO {table.name} ({', '.join(COLUMNS)}) VALUES %s ON CONFLICT DO NOTHING",
+                [(i, r["timestamp"], r["value"]) for i, r in zip(ids, rows)],
+                page_size=VALUES_PAGE_SIZE,
+            )
+            cur.execute(_TOUCH_SERIES, _seen_ranges(ids, rows))
+        raw.commit()
+    except BaseException:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def insert_rows(rows: list[dict], table: Table = metrics_table) -> None:
+    """SQLAlchemy executemany, the collector's original write path."""
+    ids = series_ids(rows)
+    values = [{"series_id": i, "timestamp": r["timestamp"], "value": r["value"]} for i, r in zip(ids, rows)]
+    with engine.begin() as conn:
+        conn.execute(insert(table).on_conflict_do_nothing(), values)
+        conn.exec_driver_sql(_TOUCH_SERIES, _seen_ranges(ids, rows))
+
+
+WRITE_METHODS = {"copy": copy_rows, "values": values_rows, "insert": insert_rows}
+
+
+class MetricWriter:
+    """Buffered, retrying writer of metric rows (see module docstring)."""
+
+    def __init__(
+        self,
+        table: Table = metrics_table,
+        method: str = INGEST_METHOD,
+        flush_rows: int = INGEST_FLUSH_ROWS,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        max_buffer: int = INGEST_MAX_BUFFER,
+        max_retries: int = INGEST_MAX_RETRIES,
+        retry_delay: float = INGEST_RETRY_DELAY,
+    ):
+        if method not in WRITE_METHODS:
+            raise ValueError(f"unknown ingest method {method!r}")
+        self.table = table
+        self._write = WRITE_METHODS[method]
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._buffer: list[dict] = []
+        self._oldest: float | None = None  # monotonic time of the oldest buffered row
+        self._lock = threading.Lock()  # guards the buffer
+        self._flush_lock = threading.Lock()  # one flush at a time; writers queue behind it
+        self._stats = {"rows_written": 0, "flushes": 0, "retries": 0, "failed_flushes": 0, "dropped": 0}
+        self._listeners: list[Callable[[list[dict]], None]] = []
+
+    def subscribe(self, callback: Callable[[list[dict]], None]):
+        """Call ``callback(rows)`` on the flushing thread with every batch of
+        rows once it is committed; failed flushes notify nobody."""
+        self._listeners.append(callback)
+
+    def write(self, rows: list[dict]) -> int:
+        """Buffer *rows* and flush if a limit is reached; returns rows written."""
+        with self._lock:
+            if rows and self._oldest is None:
+                self._oldest = time.monotonic()
+            self._buffer.extend(rows)
+        if self._due():
+            return self.flush()
+        return 0
+
+    def _due(self) -> bool:
+        with self._lock:
+            if not self._buffer:
+                return False
+            return (
+                len(self._buffer) >= self.flush_rows
+                or time.monotonic() - self._oldest >= self.flush_interval
+            )
+
+    def flush_if_due(self) -> int:
+        """Flush when the time limit has passed (for periodic callers)."""
+        return self.flush() if self._due() else 0
+
+    def flush(self) -> int:
+        """Write everything buffered; returns rows written (0 on failure)."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer, self._oldest = self._buffer, [], None
+            if not rows:
+                return 0
+
+            delay = self.retry_delay
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._write(rows, self.table)
+                    break
+                except Exception as exc:  # noqa: BLE001
+                    if attempt == self.max_retries:
+                        self._requeue(rows, exc)
+                        return 0
+                    self._stats["retries"] += 1
+                    print(f"[Ingest] flush of {len(rows)} rows failed ({exc}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    delay *= 2
+
+            self._stats["rows_written"] += len(rows)
+            self._stats["flushes"] += 1
+            for callback in self._listeners:
+                try:
+                    callback(rows)
+                except Exception as exc:  # noqa: BLE001
+                    print(f"[Ingest] subscriber error: {exc}")
+            return len(rows)
+
+    def _requeue(self, rows: list[dict], exc: Exception) -> None:
+        """Put failed rows back in front of newer ones, capped at max_buffer."""
+        self._stats["failed_flushes"] += 1
+        with self._lock:
+            buffer = rows + self._buffer
+            dropped = max(0, len(buffer) - self.max_buffer)
+            self._buffer = buffer[dropped:]
+            self._oldest = time.monotonic()
+            self._stats["dropped"] += dropped
+        print(f"[Ingest] giving up on flush ({exc}); {len(self._buffer)} rows buffered, {dropped} dropped")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "buffered": len(self._buffer)}
@@ -0,0 +1,137 @@
+"""Shared, cached host inventory from Zabbix ``host.get``.
+
+Readers (the collector and the API endpoints) get the cached host list and
+never wait on Zabbix once it has been loaded: a list older than
+``INVENTORY_TTL`` is still served while a refresh runs in the background,
+and a refresher thread keeps it current every ``INVENTORY_TTL`` seconds.
+Concurrent refreshes are collapsed into a single ``host.get`` call
+(single-flight). ``version`` only changes when the set of hosts or their
+names change, and subscribers are called with the added / removed host ids.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable
+
+from zabbix_api import ZabbixAPI
+
+INVENTORY_TTL = float(os.getenv("INVENTORY_TTL", "60"))  # seconds
+
+
+class HostInventory:
+    """Cached ``host.get`` result, refreshed in the background."""
+
+    def __init__(self, api: ZabbixAPI | None = None, ttl: float = INVENTORY_TTL):
+        self.api = api or ZabbixAPI()
+        self.ttl = ttl
+        self.version = 0
+        self.error: Exception | None = None  # last refresh failure, if any
+        self._hosts: list[dict] = []
+        self._by_id: dict[str, dict] = {}
+        self._fetched_at: float | None = None  # monotonic time of the last success
+        self._lock = threading.Lock()
+        self._flight: threading.Event | None = None  # set when the running refresh ends
+        self._listeners: list[Callable[[set[str], set[str]], None]] = []
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    # -- reading ---------------------------------------------------------
+    def hosts(self) -> list[dict]:
+        """Current host list. Blocks only until the very first load succeeds
+        (raising its error if it fails); afterwards stale data is returned
+        while a background refresh runs."""
+        if self._fetched_at is None:
+            self.refresh()
+            if self._fetched_at is None:
+                raise self.error or RuntimeError("host inventory unavailable")
+        elif time.monotonic() - self._fetched_at > self.ttl:
+            self.refresh(wait=False)
+        return self._hosts
+
+    def get(self, host_id: str) -> dict | None:
+        self.hosts()
+        return self._by_id.get(host_id)
+
+    def subscribe(self, callback: Callable[[set[str], set[str]], None]):
+        """Call ``callback(added_ids, removed_ids)`` whenever hosts change."""
+        self._listeners.append(callback)
+
+    # -- refreshing ------------------------------------------------------
+    def refresh(self, wait: bool = True):
+        """Reload from Zabbix. Joins a refresh already in flight instead of
+        starting another; with ``wait=False`` it runs in the background."""
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = threading.Event()
+        if not leader:
+            if wait:
+                flight.wait()
+            return
+        if not wait:
+            threading.Thread(target=self._load, args=(flight,), daemon=True).start()
+        else:
+            self._load(flight)
+
+    def _load(self, flight: threading.Event):
+        try:
+            hosts = self.api.host_get()
+        except Exception as exc:  # noqa: BLE001
+            self.error = exc
+            print(f"[Inventory] host.get failed: {exc}")
+        else:
+            self._store(hosts)
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.set()
+
+    def _store(self, hosts: list[dict]):
+        by_id = {h["hostid"]: h for h in hosts}
+        added = by_id.keys() - self._by_id.keys()
+        removed = self._by_id.keys() - by_id.keys()
+        changed = added or removed or any(self._by_id[i] != h for i, h in by_id.items() if i in self._by_id)
+        # Swap whole objects so readers never see a half-updated list
+        self._hosts, self._by_id = hosts, by_id
+        self._fetched_at = time.monotonic()
+        self.error = None
+        if changed:
+            self.version += 1
+            print(f"[Inventory] {len(hosts)} host(s), +{len(added)} / -{len(removed)}")
+            for callback in self._listeners:
+                try:
+                    callback(set(added), set(removed))
+                except Exception as exc:  # noqa: BLE001
+                    print(f"[Inventory] listener error: {exc}")
+
+    def start(self):
+        """Start the background refresher (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="host-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.refresh()
+            self._stop_event.wait(self.ttl)
+
+    def stats(self) -> dict:
+        age = None if self._fetched_at is None else round(time.monotonic() - self._fetched_at, 1)
+        return {
+            "hosts": len(self._hosts),
+            "version": self.version,
+            "age_s": age,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+host_inventory = HostInventory()
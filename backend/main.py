@@ -1,13 +1,17 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-import requests
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from anyio import to_thread
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Literal, Optional
 import os
 import logging
 import smtplib
 from email.mime.text import MIMEText
 from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+from functools import lru_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,47 +30,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Environment variables
-ZABBIX_API_URL = os.getenv("ZABBIX_API_URL", "http://zabbix-server/api_jsonrpc.php")
-ZABBIX_USER = os.getenv("ZABBIX_USER", "Admin")
-ZABBIX_PASSWORD = os.getenv("ZABBIX_PASSWORD", "zabbix")
-
-# Authentication token cache
-zabbix_auth_token = None
-
-class ZabbixAuth:
-    @staticmethod
-    def get_auth_token():
-        global zabbix_auth_token
-        
-        if zabbix_auth_token:
-            return zabbix_auth_token
-            
-        headers = {"Content-Type": "application/json"}
-        data = {
-            "jsonrpc": "2.0",
-            "method": "user.login",
-            "params": {
-                "user": ZABBIX_USER,
-                "password": ZABBIX_PASSWORD
-            },
-            "id": 1
-        }
-        
-        try:
-            response = requests.post(ZABBIX_API_URL, json=data, headers=headers)
-            response.raise_for_status()
-            zabbix_auth_token = response.json().get("result")
-            return zabbix_auth_token
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to authenticate with Zabbix: {str(e)}")
-
 # API Models
 class HostStatus(BaseModel):
     host_id: str
     name: str
-    status: str
-    last_check: datetime
+    status: str  # up | down | warning (open problems) | unknown | disabled
+    last_check: Optional[datetime] = None  # newest stored metric of the host
     issues: List[str] = []
 
 class NetworkMetrics(BaseModel):
@@ -79,6 +48,17 @@ class NetworkMetrics(BaseModel):
     network_out: float
 
 
+# Item keys behind the NetworkMetrics fields
+CPU_KEY = "system.cpu.util"
+MEM_KEY = "vm.memory.size[available]"
+MEM_TOTAL_KEY = "vm.memory.size[total]"
+NET_IN_PATTERN = "net.if.in*"
+NET_OUT_PATTERN = "net.if.out*"
+
+# Value fields of NetworkMetrics, downsampled as separate series
+METRIC_FIELDS = ("cpu_usage", "memory_usage", "memory_total", "network_in", "network_out")
+
+
 class HostKeys(BaseModel):
     host_id: str
     keys: List[str]
@@ -111,11 +91,39 @@ class EmailConfig(BaseModel):
     recipients: str  # Comma-separated
 
 # Start background collector
-from collector import ZabbixCollector, ZabbixAPI
+from collector import ZabbixCollector
+from zabbix_api import ZabbixAPI, get_session as get_zabbix_session
 from email_notifier import EmailNotifier
 from config import get_email_config as load_email_config_from_file, save_email_config as save_email_config_to_file
 from ai_analyzer import AIAnalyzer
-from anomaly_detector import AnomalyDetector
+from anomaly_detector import ANOMALY_MODE, AnomalyDetector, subscribe_anomalies
+from rollups import METRICS_MAX_POINTS, metric_source
+from downsample import downsample_indices
+from series_query import read_series
+from series import series_cache
+from inventory import host_inventory
+from alerts import alert_poller
+from events import event_hub
+from response_cache import REDIS_URL, response_cache
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from pipeline import PIPELINE_WRITERS
+
+# Set to 0 when collection runs in separate collector_main.py processes
+EMBEDDED_COLLECTOR = os.getenv("EMBEDDED_COLLECTOR", "1").lower() not in ("0", "false", "no")
+
+# Database connections the background threads of this process may hold at
+# once: the collector and its ingest writers, the anomaly detector, and one
+# for the email notifier's config reads.
+BACKGROUND_DB_CONNECTIONS = (1 + PIPELINE_WRITERS if EMBEDDED_COLLECTOR else 0) + (ANOMALY_MODE == "poll") + 1
+
+# Worker threads for the blocking (plain ``def``) endpoints; FastAPI runs
+# those in AnyIO's thread pool so database and Zabbix calls never block the
+# event loop. By default the database pool (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# minus what the background threads need, so requests never wait for a
+# connection.
+API_THREADS = int(
+    os.getenv("API_THREADS", str(max(DB_POOL_SIZE + DB_MAX_OVERFLOW - BACKGROUND_DB_CONNECTIONS, 1)))
+)
 
 collector_thread: ZabbixCollector | None = None
 email_notifier_thread: EmailNotifier | None = None
@@ -126,15 +134,39 @@ anomaly_detector_thread: AnomalyDetector | None = None
 async def _startup():
     """Initializes and starts background threads for data collection and notifications."""
     global collector_thread, email_notifier_thread, ai_analyzer_thread, anomaly_detector_thread
-    
+
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADS
+    if API_THREADS + BACKGROUND_DB_CONNECTIONS > DB_POOL_SIZE + DB_MAX_OVERFLOW:
+        logger.warning(
+            f"API_THREADS={API_THREADS} plus {BACKGROUND_DB_CONNECTIONS} background connections exceed "
+            f"the database pool of {DB_POOL_SIZE + DB_MAX_OVERFLOW}; requests may wait for a connection."
+        )
+
     # Start Zabbix Collector
     try:
-        if collector_thread is None:
+        if collector_thread is None and EMBEDDED_COLLECTOR:
             collector_thread = ZabbixCollector()
+            # Once rows are committed: invalidate cached responses, then tell clients
+            collector_thread.writer.subscribe(lambda rows: response_cache.bump("metrics"))
+            collector_thread.writer.subscribe(_publish_metrics)
             collector_thread.start()
             logger.info("Zabbix collector thread started.")
     except Exception as e:
         logger.error(f"Failed to start Zabbix collector: {e}", exc_info=True)
+    if not EMBEDDED_COLLECTOR and not REDIS_URL:
+        # Writes happen in collector_main.py processes that cannot bump this
+        # process' epochs: notice them from the series catalog and anomaly ids
+        response_cache.watch("metrics", _metrics_watermark)
+        response_cache.watch("anomalies", _anomalies_watermark)
+        logger.info("Response cache follows separate collectors through database probes.")
+
+    # Keep the shared host inventory and alert snapshot warm for the collector and endpoints
+    host_inventory.start()
+    alert_poller.subscribe(lambda diff: response_cache.bump("alerts"))
+    alert_poller.subscribe(_publish_alerts)
+    alert_poller.start()
+    subscribe_anomalies(lambda stored: response_cache.bump("anomalies"))
+    subscribe_anomalies(_publish_anomalies)
 
     # Initialize AI Analyzer
     try:
@@ -163,15 +195,26 @@ async def _startup():
     except Exception as e:
         logger.error(f"Failed to start email notifier: {e}", exc_info=True)
 
-    # Start Anomaly Detector
+    # Start Anomaly Detector (in "stream" mode the collector does the detection)
     try:
-        if anomaly_detector_thread is None:
+        if anomaly_detector_thread is None and ANOMALY_MODE == "poll":
             anomaly_detector_thread = AnomalyDetector()
             anomaly_detector_thread.start()
             logger.info("Anomaly detector thread started.")
     except Exception as e:
         logger.error(f"Failed to start anomaly detector: {e}", exc_info=True)
 
+
+@app.on_event("shutdown")
+def _shutdown():
+    """Stop the collector and let its pipeline write the rows still queued."""
+    host_inventory.stop()
+    alert_poller.stop()
+    if collector_thread is not None:
+        collector_thread.stop()
+        collector_thread.join(timeout=60)
+        logger.info("Zabbix collector thread stopped.")
+
 # API Endpoints
 
 @app.get("/api/config/email", response_model=EmailConfig)
@@ -236,13 +279,27 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/api/stats")
+def get_stats():
+    """Internal counters of the shared backend components."""
+    stats = {
+        "zabbix_session": get_zabbix_session().stats(),
+        "inventory": host_inventory.stats(),
+        "alerts": alert_poller.stats(),
+        "events": event_hub.stats(),
+        "response_cache": response_cache.stats(),
+    }
+    if collector_thread is not None:
+        stats["pipeline"] = collector_thread.pipeline.stats()
+        stats["ingest"] = collector_thread.writer.stats()
+    return stats
+
 @app.get("/api/alerts/{alert_id}/analyze")
-def analyze_alert_api(alert_id: str, auth: str = Depends(ZabbixAuth.get_auth_token)):
+def analyze_alert_api(alert_id: str):
     """
     Provides AI-powered analysis for a specific alert.
     """
     api = ZabbixAPI()
-    api.auth_token = auth
     alerts = api.get_problem_by_id(alert_id)
     if not alerts:
         raise HTTPException(status_code=404, detail="Alert not found.")
@@ -262,22 +319,53 @@ def analyze_alert_api(alert_id: str, auth: str = Depends(ZabbixAuth.get_auth_tok
     return result
 
 
+def _cached_json(name: str, params: tuple, sources: tuple[str, ...], compute) -> Response:
+    """JSON response of ``compute()`` (content, or an already encoded body)
+    through the shared response cache, recomputed when one of the data
+    *sources* has been written since."""
+
+    def render() -> bytes:
+        content = compute()
+        return content if isinstance(content, bytes) else JSONResponse(content).body
+
+    return Response(response_cache.get(name, params, sources, render), media_type="application/json")
+
+
+def _metrics_watermark():
+    """Newest sample time of any series (changes with every metrics write)."""
+    from sqlalchemy import text  # local import to avoid circular deps
+    from database import engine
+
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT max(last_seen) FROM series")).scalar()
+
+
+def _anomalies_watermark():
+    """Newest anomaly id (changes with every stored anomaly)."""
+    from sqlalchemy import text  # local import to avoid circular deps
+    from database import engine
+
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT max(id) FROM anomalies")).scalar()
+
+
 @app.get("/api/anomalies", response_model=List[Anomaly])
 def get_anomalies():
-    """Returns a list of detected anomalies."""
+    """Returns a list of detected anomalies (cached until the next one)."""
     from database import anomalies_table, engine
     from sqlalchemy import select
 
-    stmt = select(anomalies_table).order_by(anomalies_table.c.timestamp.desc()).limit(100)
-    with engine.begin() as conn:
-        result = conn.execute(stmt).fetchall()
-    return result
+    def compute():
+        stmt = select(anomalies_table).order_by(anomalies_table.c.timestamp.desc()).limit(100)
+        with engine.begin() as conn:
+            result = conn.execute(stmt).mappings().all()
+        return jsonable_encoder([Anomaly(**r) for r in result])
+
+    return _cached_json("anomalies", (), ("anomalies",), compute)
 
 
 def get_zabbix_api():
-    api = ZabbixAPI()
-    api.login()
-    return api
+    return ZabbixAPI()
 
 @app.post("/api/alerts/{alert_id}/email")
 def send_alert_email(alert_id: str):
@@ -287,7 +375,6 @@ def send_alert_email(alert_id: str):
     loading the saved email configuration and sending directly.
     """
     api = ZabbixAPI()
-    api.login()
     alert_data = api.get_problem_by_id(trigger_id=alert_id)
     if not alert_data:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -348,127 +435,354 @@ def remediate(request: RemediationRequest, zabbix_api: ZabbixAPI = Depends(get_z
 
 
 @app.get("/api/hosts/status", response_model=List[HostStatus])
-async def get_hosts_status():
-    """Get status of all monitored hosts using Zabbix API."""
-    api = ZabbixAPI()
+def get_hosts_status():
+    """Get status of all monitored hosts.
+
+    Hosts and their interface availability come from the cached inventory,
+    open problems from the shared alert snapshot and ``last_check``
+    from the ``last_seen`` of the host's series. The answer is cached until
+    the next metrics write or alert change.
+    """
+    return _cached_json("hosts/status", (), ("metrics", "alerts"), lambda: jsonable_encoder(_hosts_status()))
+
+
+def _hosts_status() -> List[HostStatus]:
+    from sqlalchemy import text  # local import to avoid circular deps
+    from database import engine
+
     try:
-        api.login()
-        hosts_raw = api.host_get()  # returns list of {hostid, host}
+        hosts_raw = host_inventory.hosts()  # cached host.get; refreshed in the background
     except Exception as exc:
         # Fallback to previous mock behaviour if Zabbix is unreachable
         logger.error(f"Failed to fetch hosts from Zabbix: {exc}")
         hosts_raw = [{"hostid": "unknown", "host": "Unknown"}]
 
+    issues: dict[str, list[str]] = {}
+    try:
+        for t in alert_poller.current().triggers:
+            for h in t.get("hosts", []):
+                issues.setdefault(h["hostid"], []).append(t["description"])
+    except Exception as exc:
+        logger.error(f"Failed to fetch problems from Zabbix: {exc}")
+
+    # Newest sample per host from the series catalog (kept by the writers)
+    with engine.connect() as conn:
+        last_check = dict(
+            conn.execute(text("SELECT host_id, max(last_seen) FROM series GROUP BY host_id")).all()
+        )
+
     hosts_status: List[HostStatus] = []
-    now = datetime.utcnow()
     for h in hosts_raw:
+        host_issues = issues.get(h["hostid"], [])
         hosts_status.append(
             HostStatus(
                 host_id=h["hostid"],
                 name=h.get("name") or h.get("host", h["hostid"]),
-                status="up",  # Basic status; could be refined via host.get availability
-                last_check=now,
-                issues=[],
+                status=_host_availability(h, host_issues),
+                last_check=last_check.get(h["hostid"]),
+                issues=host_issues,
             )
         )
     return hosts_status
 
+
+def _host_availability(host: dict, issues: list[str]) -> str:
+    """Status from Zabbix host status / interface availability
+    (0 unknown, 1 available, 2 unavailable) and open problems."""
+    if str(host.get("status")) == "1":
+        return "disabled"
+    available = {str(i.get("available")) for i in host.get("interfaces", [])}
+    if "2" in available:
+        return "down"
+    if issues:
+        return "warning"
+    if "1" in available:
+        return "up"
+    return "unknown"
+
 @app.get("/api/hosts/metrics-keys", response_model=List[HostKeys])
-async def get_hosts_metric_keys():
-    """Return list of hosts with the metric keys available in the *metrics* table."""
-    from sqlalchemy import select  # local import to avoid circular deps
-    from database import engine, metrics_table
+def get_hosts_metric_keys():
+    """Return list of hosts with the metric keys stored in the series catalog
+    (served from the in-process series cache)."""
+    return _cached_json(
+        "hosts/metrics-keys",
+        (),
+        ("metrics",),
+        lambda: jsonable_encoder([HostKeys(host_id=h, keys=ks) for h, ks in series_cache.catalog().items()]),
+    )
 
-    stmt = select(metrics_table.c.host_id, metrics_table.c.item_key).distinct()
+@app.get("/api/alerts", response_model=List[Alert])
+def get_alerts(request: Request, response: Response):
+    """Open problems from the shared alert snapshot (no Zabbix call per
+    request). Clients revalidating with ``If-None-Match`` get a 304 while
+    the problem set is unchanged."""
+    snapshot = alert_poller.current()
+    etag = f'"{snapshot.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return _alerts_of(snapshot)
+
+
+_alerts_cache: tuple[str, List[Alert]] = ("", [])
+
+
+def _alerts_of(snapshot) -> List[Alert]:
+    """Alert models of a snapshot, built once per snapshot."""
+    global _alerts_cache
+    etag, alerts = _alerts_cache
+    if etag == snapshot.etag:
+        return alerts
+    alerts = [Alert(**_alert_fields(t)) for t in snapshot.triggers if t.get("hosts")]
+    _alerts_cache = (snapshot.etag, alerts)
+    return alerts
+
+
+def _alert_fields(trigger) -> dict:
+    return {
+        "id": trigger["triggerid"],
+        "host": trigger["hosts"][0]["host"],
+        "hostid": trigger["hosts"][0]["hostid"],
+        "name": trigger["description"],
+        "severity": int(trigger["priority"]),
+    }
 
-    mapping: dict[str, set[str]] = {}
-    with engine.begin() as conn:
-        for host_id, item_key in conn.execute(stmt):
-            mapping.setdefault(host_id, set()).add(item_key)
+@app.get("/api/metrics/{host_id}", response_model=List[NetworkMetrics])
+def get_host_metrics(
+    host_id: str,
+    hours: int = 24,
+    max_points: int = METRICS_MAX_POINTS,
+    fmt: Literal["rows", "columnar"] = Query("rows", alias="format"),
+):
+    """Return recent metrics for a host (default last *hours* hours).
+
+    Long ranges are read from the finest rollup tier (5 min / 1 h / 1 day
+    averages) that keeps the response within *max_points* timestamps; whatever
+    still exceeds it is downsampled per series with LTTB.
+
+    ``?format=columnar`` returns one object of parallel arrays instead of one
+    object per timestamp: ``timestamp`` (epoch milliseconds) and one array
+    per NetworkMetrics value field. It skips the response model entirely.
+    Both are cached until the next metrics write.
+    """
 
-    return [HostKeys(host_id=h, keys=sorted(ks)) for h, ks in mapping.items()]
+    def compute():
+        rows = _host_metric_rows(host_id, hours, max_points)
+        if fmt == "columnar":
+            return _metric_columns(host_id, rows)
+        # Validated once and encoded in one pass, as the response model would
+        points = _metric_rows_adapter.validate_python([{"host_id": host_id, **r} for r in rows])
+        return _metric_rows_adapter.dump_json(points)
 
-@app.get("/api/alerts", response_model=List[Alert])
-def get_alerts():
-    api = ZabbixAPI()
-    api.login()
-    triggers = api.problem_get()  # This method now calls trigger.get
+    return _cached_json("metrics/host", (host_id, hours, max_points, fmt), ("metrics",), compute)
 
-    response = []
-    for t in triggers:
-        if not t.get("hosts"):
-            continue
-        response.append(
-            Alert(
-                id=t["triggerid"],
-                host=t["hosts"][0]["host"],
-                hostid=t["hosts"][0]["hostid"],
-                name=t["description"],
-                severity=int(t["priority"]),
-            )
-        )
-    return response
 
-@app.get("/api/metrics/{host_id}", response_model=List[NetworkMetrics])
-async def get_host_metrics(host_id: str, hours: int = 24):
-    """Return recent metrics for a host (default last *hours* hours)."""
+_metric_rows_adapter = TypeAdapter(List[NetworkMetrics])
+
+
+def _host_metric_rows(host_id: str, hours: int, max_points: int) -> list:
+    """One pivoted row per timestamp (``timestamp`` plus METRIC_FIELDS)."""
     from sqlalchemy import select, and_, func  # local import to avoid circular deps
-    from database import engine, metrics_table
+    from database import engine
 
     since = datetime.utcnow() - timedelta(hours=hours)
-
+    src = metric_source(hours * 3600, max_points)
+
+    # Resolve the host's keys to series ids in memory; the query only sees ids
+    keys = series_cache.host_series(host_id)
+    cpu, mem, mem_total = (keys.get(k) for k in (CPU_KEY, MEM_KEY, MEM_TOTAL_KEY))
+    net_in = [i for k, i in keys.items() if fnmatchcase(k, NET_IN_PATTERN)]
+    net_out = [i for k, i in keys.items() if fnmatchcase(k, NET_OUT_PATTERN)]
+    wanted = [i for i in (cpu, mem, mem_total, *net_in, *net_out) if i is not None]
+    if not wanted:
+        return []
+
+    # Pivot in SQL: one row per timestamp with one column per metric
     stmt = (
         select(
-            metrics_table.c.timestamp,
-            metrics_table.c.item_key,
-            metrics_table.c.value,
+            src.timestamp.label("timestamp"),
+            func.coalesce(func.max(src.value).filter(src.series_id == cpu), 0.0).label("cpu_usage"),
+            func.coalesce(func.max(src.value).filter(src.series_id == mem), 0.0).label("memory_usage"),
+            func.max(src.value).filter(src.series_id == mem_total).label("memory_total"),
+            # Traffic is summed over all interfaces
+            func.coalesce(func.sum(src.value).filter(src.series_id.in_(net_in)), 0.0).label("network_in"),
+            func.coalesce(func.sum(src.value).filter(src.series_id.in_(net_out)), 0.0).label("network_out"),
         )
-        .where(
-            and_(
-                metrics_table.c.host_id == host_id,
-                metrics_table.c.timestamp >= since,
-            )
+        .where(and_(src.series_id.in_(wanted), src.timestamp >= since))
+        .group_by(src.timestamp)
+        .order_by(src.timestamp)
+    )
+
+    with engine.begin() as conn:
+        rows = conn.execute(stmt).mappings().all()
+
+    # Downsample with LTTB so the payload stays within max_points whatever the range
+    if max_points > 0 and len(rows) > max_points:
+        keep = downsample_indices(
+            [r["timestamp"].timestamp() for r in rows],
+            ([r[field] for r in rows] for field in METRIC_FIELDS),
+            max_points,
+        )
+        rows = [rows[i] for i in keep]
+    return rows
+
+
+def _metric_columns(host_id: str, rows: list) -> dict:
+    """Pivoted rows as parallel arrays, timestamps in epoch milliseconds."""
+    columns = {
+        "host_id": host_id,
+        "timestamp": [round(r["timestamp"].timestamp() * 1000) for r in rows],
+    }
+    for field in METRIC_FIELDS:
+        columns[field] = [r[field] for r in rows]
+    return columns
+
+
+@app.get("/api/metrics")
+def get_metrics_batch(
+    hosts: List[str] = Query([], alias="host"),
+    keys: List[str] = Query([], alias="key"),
+    hours: int = 24,
+    max_points: int = METRICS_MAX_POINTS,
+    agg: Optional[Literal["sum", "max", "min", "avg"]] = None,
+):
+    """Recent samples of several hosts and item keys in one round-trip.
+
+    Hosts and keys are repeated parameters
+    (``?host=10001&host=10002&key=system.cpu.util&key=net.if.in*``); keys
+    may be glob patterns, matched in SQL through the series index. Without
+    *agg* every matching series is returned under its item key; with
+    ``agg=sum|max|min|avg`` the series a key matches on a host are combined
+    per timestamp under the key itself (e.g. traffic summed over all
+    interfaces). All data is read with one query on the (series_id,
+    timestamp) index, from the rollup tier that fits *max_points*; as in
+    ``/api/metrics/{host_id}`` each host's series share *max_points* and are
+    downsampled with LTTB. The response is columnar and grouped per host,
+    timestamps in epoch milliseconds; series that do not exist are left out::
+
+        {"hosts": {"10001": {"system.cpu.util": {"timestamp": [...], "value": [...]}}}}
+    """
+    if not hosts or not keys:
+        raise HTTPException(status_code=400, detail="At least one host and one key are required.")
+    try:
+        return _cached_json(
+            "metrics",
+            (tuple(hosts), tuple(keys), hours, max_points, agg),
+            ("metrics",),
+            lambda: {"hosts": read_series(hosts, keys, hours, max_points, agg)},
         )
-        .order_by(metrics_table.c.timestamp)
+    except ValueError as exc:  # more series than max_points
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/events")
+async def stream_events(types: Optional[str] = None, hosts: Optional[str] = None):
+    """Server-Sent Events stream of ``metrics``, ``alerts`` and ``anomalies``
+    as they are produced.
+
+    *types* and *hosts* are comma-separated filters; without them every event
+    type and every host is sent. Each event is serialized once by the shared
+    ``event_hub`` for all connected clients.
+    """
+    sub = event_hub.subscribe(kinds=_csv_param(types), hosts=_csv_param(hosts))
+
+    async def body():
+        try:
+            async for frame in sub.frames():
+                yield frame
+        finally:
+            event_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    cpu_key = "system.cpu.util"
-    mem_key = "vm.memory.size[available]"
-    mem_total_key = "vm.memory.size[total]"
 
-    # Build mapping {timestamp -> {item_key: value}}
-    buckets: dict[Any, dict[str, float]] = {}
-    with engine.begin() as conn:
-        for ts, key, val in conn.execute(stmt):
-            buckets.setdefault(ts, {})[key] = float(val)
-
-    response: List[NetworkMetrics] = []
-    for ts in sorted(buckets.keys()):
-        data = buckets[ts]
-
-
-
-        # Find network keys dynamically
-        net_in_value = 0.0
-        net_out_value = 0.0
-        for key, value in data.items():
-            if key.startswith('net.if.in'):
-                net_in_value = value
-            elif key.startswith('net.if.out'):
-                net_out_value = value
-
-        response.append(
-            NetworkMetrics(
-                timestamp=ts,
-                host_id=host_id,
-                cpu_usage=data.get(cpu_key, 0.0),
-                memory_usage=data.get(mem_key, 0.0),
-                memory_total=data.get(mem_total_key),
-                network_in=net_in_value,
-                network_out=net_out_value,
-            )
+def _csv_param(value: Optional[str]) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+@lru_cache(maxsize=4096)
+def _metric_field(item_key: str) -> Optional[str]:
+    """The NetworkMetrics field an item key feeds, if any."""
+    if item_key == CPU_KEY:
+        return "cpu_usage"
+    if item_key == MEM_KEY:
+        return "memory_usage"
+    if item_key == MEM_TOTAL_KEY:
+        return "memory_total"
+    if fnmatchcase(item_key, NET_IN_PATTERN):
+        return "network_in"
+    if fnmatchcase(item_key, NET_OUT_PATTERN):
+        return "network_out"
+    return None
+
+
+def _publish_metrics(rows: list[dict]):
+    """Push a collected batch as NetworkMetrics points, pivoted per host and
+    timestamp the same way as ``/api/metrics/{host_id}``."""
+    by_host: dict[str, dict[datetime, dict]] = {}
+    skipped: set[str] = set()
+    for r in rows:
+        host_id = r["host_id"]
+        field = _metric_field(r["item_key"])
+        if field is None or host_id in skipped:
+            continue
+        if host_id not in by_host:
+            if not event_hub.wants("metrics", host_id):
+                skipped.add(host_id)
+                continue
+            by_host[host_id] = {}
+        point = by_host[host_id].get(r["timestamp"])
+        if point is None:
+            point = by_host[host_id][r["timestamp"]] = {
+                "timestamp": r["timestamp"],
+                "host_id": host_id,
+                "cpu_usage": 0.0,
+                "memory_usage": 0.0,
+                "memory_total": None,
+                "network_in": 0.0,
+                "network_out": 0.0,
+            }
+        value = float(r["value"])
+        if field in ("network_in", "network_out"):
+            point[field] += value  # summed over all interfaces
+        else:
+            point[field] = value
+    for host_id, points in by_host.items():
+        event_hub.publish(
+            "metrics",
+            {"host_id": host_id, "points": sorted(points.values(), key=lambda p: p["timestamp"])},
+            host_id=host_id,
         )
-    return response
+
+
+def _publish_alerts(diff):
+    """Push alert diffs per host: new problems as Alert objects, resolved
+    ones as trigger ids."""
+    by_host: dict[str, dict] = {}
+    for t in diff.new:
+        if t.get("hosts"):
+            change = by_host.setdefault(t["hosts"][0]["hostid"], {"new": [], "resolved": []})
+            change["new"].append(_alert_fields(t))
+    for t in diff.resolved:
+        if t.get("hosts"):
+            change = by_host.setdefault(t["hosts"][0]["hostid"], {"new": [], "resolved": []})
+            change["resolved"].append(t["triggerid"])
+    for host_id, change in by_host.items():
+        event_hub.publish("alerts", change, host_id=host_id)
+
+
+def _publish_anomalies(stored: list[dict]):
+    """Push newly stored anomalies per host."""
+    by_host: dict[str, list[dict]] = {}
+    for a in stored:
+        by_host.setdefault(a["host_id"], []).append(a)
+    for host_id, anomalies in by_host.items():
+        event_hub.publish("anomalies", {"anomalies": anomalies}, host_id=host_id)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,189 @@
+"""Staged collector pipeline: fetch -> bounded queue -> batch writers.
+
+The collector thread only fetches; each cycle's rows are handed to a bounded
+queue of ``PIPELINE_QUEUE_SIZE`` batches and written (and fed to the
+streaming detector) by ``PIPELINE_WRITERS`` writer threads, so a slow commit
+no longer delays the next scrape. When the queue is full ``PIPELINE_POLICY``
+decides what happens:
+
+* ``block`` - the fetcher waits for room (backpressure on Zabbix polling)
+* ``drop_oldest`` - the oldest queued batch is discarded
+* ``drop_newest`` - the incoming batch is discarded
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+
+from ingest import MetricWriter
+from stream_detector import StreamingDetector
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "10"))  # batches
+PIPELINE_WRITERS = int(os.getenv("PIPELINE_WRITERS", "1"))
+PIPELINE_POLICY = os.getenv("PIPELINE_POLICY", "block")  # block | drop_oldest | drop_newest
+
+POLICIES = ("block", "drop_oldest", "drop_newest")
+_POLL = 0.5  # seconds between stop checks of blocked threads
+
+
+class StageTimer:
+    """Count, mean and max latency of one pipeline stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def stats(self) -> dict:
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "avg_ms": round(avg * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "last_ms": round(self.last * 1000, 1),
+        }
+
+
+class CollectorPipeline:
+    """Bounded queue between the collector's fetches and the metric writers."""
+
+    def __init__(
+        self,
+        writer: MetricWriter,
+        detector: StreamingDetector | None = None,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        writers: int = PIPELINE_WRITERS,
+        policy: str = PIPELINE_POLICY,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown pipeline policy {policy!r}")
+        self.writer = writer
+        self.detector = detector
+        self.policy = policy
+        self._queue: queue.Queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._n_writers = max(writers, 1)
+        self._threads: list[threading.Thread] = []
+        self._closing = threading.Event()
+        self._lock = threading.Lock()
+        self._timers = {stage: StageTimer() for stage in ("fetch", "queue_wait", "write", "detect")}
+        self._counts = {"batches": 0, "rows": 0, "dropped_batches": 0, "dropped_rows": 0, "errors": 0}
+
+    def start(self):
+        """Start the writer threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self._n_writers):
+                t = threading.Thread(target=self._drain, name=f"metric-writer-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._timers[stage].add(seconds)
+
+    def submit(self, rows: list[dict]) -> bool:
+        """Queue one batch of rows; returns False if it (or nothing) was queued
+        because the queue was full or the pipeline is closing."""
+        if not rows or self._closing.is_set():
+            return False
+        self.start()
+        item = (time.monotonic(), rows)
+        if self.policy == "block":
+            while not self._closing.is_set():
+                try:
+                    self._queue.put(item, timeout=_POLL)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                self._dropped(rows)
+                return False
+        else:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                if self.policy == "drop_newest":
+                    self._dropped(rows)
+                    return False
+                try:
+                    self._dropped(self._queue.get_nowait()[1])
+                    self._queue.task_done()
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(item)
+        with self._lock:
+            self._counts["batches"] += 1
+            self._counts["rows"] += len(rows)
+        return True
+
+    def _dropped(self, rows: list[dict]):
+        with self._lock:
+            self._counts["dropped_batches"] += 1
+            self._counts["dropped_rows"] += len(rows)
+        print(f"[Pipeline] queue full ({self.policy}); dropped a batch of {len(rows)} rows")
+
+    def _drain(self):
+        while True:
+            try:
+                queued_at, rows = self._queue.get(timeout=_POLL)
+            except queue.Empty:
+                if self._closing.is_set():
+                    return
+                self.writer.flush_if_due()
+                continue
+            try:
+                self.record("queue_wait", time.monotonic() - queued_at)
+                self._handle(rows)
+            finally:
+                self._queue.task_done()
+
+    def _handle(self, rows: list[dict]):
+        start = time.monotonic()
+        try:
+            self.writer.write(rows)
+        except Exception as exc:  # noqa: BLE001
+            with self._lock:
+                self._counts["errors"] += 1
+            print(f"[Pipeline] write error: {exc}")
+        self.record("write", time.monotonic() - start)
+        if self.detector is not None:
+            start = time.monotonic()
+            try:
+                self.detector.process(rows)
+            except Exception as exc:  # noqa: BLE001
+                with self._lock:
+                    self._counts["errors"] += 1
+                print(f"[Pipeline] detector error: {exc}")
+            self.record("detect", time.monotonic() - start)
+
+    def close(self, timeout: float | None = 30):
+        """Stop accepting batches, drain the queue, then flush the writer."""
+        self._closing.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if any(t.is_alive() for t in self._threads):
+            print(f"[Pipeline] writers still busy after {timeout}s; {self._queue.qsize()} batches left")
+        self.writer.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "writers": self._n_writers,
+                **self._counts,
+                "latency": {stage: timer.stats() for stage, timer in self._timers.items()},
+            }
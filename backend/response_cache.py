@@ -0,0 +1,267 @@
+"""Shared cache of rendered API responses.
+
+The read endpoints of the dashboard recompute the same answer for every
+client although their data only changes when the collector writes (once per
+``COLLECT_INTERVAL``), an anomaly is stored or the alert snapshot changes.
+``response_cache.get`` keeps the encoded JSON body of such a response under
+the endpoint name, its parameters and the current *epoch* of every data
+source it depends on. Writers call ``bump(source)`` after they commit, which
+moves the epoch on so the next request computes (and caches) a fresh answer;
+entries of older epochs are never read again and age out. Entries also
+expire after ``RESPONSE_CACHE_TTL`` seconds, which bounds the staleness of
+sources without an epoch (the host inventory) and of writes made by another
+process when the epochs are not shared. For the latter, ``watch`` bumps a
+source whenever a cheap probe of the database (e.g. the newest
+``series.last_seen``) changes, checked at most every
+``RESPONSE_CACHE_PROBE`` seconds.
+
+Concurrent misses of the same entry are computed once: the first request
+computes while the others wait for its result (single flight), so a new
+epoch does not send every dashboard to the database at once.
+
+By default entries live in this process, in an LRU capped at
+``RESPONSE_CACHE_MAX_BYTES`` of response bodies. With ``REDIS_URL`` set
+(needs the ``redis`` package) entries, epochs and the single-flight locks
+live in Redis or a compatible server instead, so all uvicorn workers and
+separate ``collector_main.py`` processes share them; memory is then capped
+by the server's ``maxmemory`` policy. ``RESPONSE_CACHE_TTL=0`` disables the
+cache.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))  # seconds; 0 disables
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_WAIT = float(os.getenv("RESPONSE_CACHE_WAIT", "10"))  # seconds to wait for another computation
+RESPONSE_CACHE_PROBE = float(os.getenv("RESPONSE_CACHE_PROBE", "2"))  # seconds between watch probes
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_PREFIX = "respcache:"
+
+
+class LocalStore:
+    """In-process LRU of response bodies, bounded in bytes."""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()  # key -> (expires, body)
+        self._epochs: dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def epochs(self, sources: Iterable[str]) -> tuple[int, ...]:
+        with self._lock:
+            return tuple(self._epochs.get(s, 0) for s in sources)
+
+    def bump(self, source: str):
+        with self._lock:
+            self._epochs[source] = self._epochs.get(source, 0) + 1
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, body: bytes, ttl: float):
+        size = len(key) + len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, body)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(key) + len(body)
+
+    def lock(self, key: str, timeout: float) -> bool:
+        return True  # in-process flights are tracked by ResponseCache
+
+    def unlock(self, key: str):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "local", "entries": len(self._entries), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class RedisStore:
+    """Entries, epochs and flight locks in a Redis-compatible server."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_PREFIX):
+        import redis  # optional dependency, only needed with REDIS_URL
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def epochs(self, sources: Iterable[str]) -> tuple[int, ...]:
+        sources = list(sources)
+        if not sources:
+            return ()
+        values = self.client.mget([f"{self.prefix}epoch:{s}" for s in sources])
+        return tuple(int(v or 0) for v in values)
+
+    def bump(self, source: str):
+        self.client.incr(f"{self.prefix}epoch:{source}")
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, body: bytes, ttl: float):
+        self.client.set(self.prefix + key, body, px=int(ttl * 1000))
+
+    def lock(self, key: str, timeout: float) -> bool:
+        """Whether this process should compute *key* (no other one is)."""
+        return bool(self.client.set(f"{self.prefix}lock:{key}", 1, nx=True, px=int(timeout * 1000)))
+
+    def unlock(self, key: str):
+        self.client.delete(f"{self.prefix}lock:{key}")
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+class _Flight:
+    """A computation other requests for the same entry wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.body: bytes | None = None
+
+
+class ResponseCache:
+    """Epoch-keyed response cache with TTL, single flight and hit/miss counts."""
+
+    def __init__(self, store=None, ttl: float = RESPONSE_CACHE_TTL, wait: float = RESPONSE_CACHE_WAIT):
+        self.store = store if store is not None else (RedisStore() if REDIS_URL else LocalStore())
+        self.ttl = ttl
+        self.wait = wait
+        self._flights: dict[str, _Flight] = {}
+        self._watches: dict[str, list] = {}  # source -> [probe, interval, next check, last value]
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _safe(self, what: str, fn, *args):
+        """``fn(*args)``, or ``None`` when the store fails: a cache outage must
+        not fail the request."""
+        try:
+            return fn(*args)
+        except Exception as exc:  # noqa: BLE001
+            self._count("errors")
+            print(f"[ResponseCache] {what} failed: {exc}")
+            return None
+
+    def bump(self, source: str):
+        """Invalidate every entry depending on *source* (after a write)."""
+        self._safe("bump", self.store.bump, source)
+
+    def watch(self, source: str, probe: Callable[[], object], interval: float = RESPONSE_CACHE_PROBE):
+        """Bump *source* whenever ``probe()`` returns a new value; probed on
+        lookups, at most every *interval* seconds. For data written by
+        processes that cannot bump the epochs themselves."""
+        with self._lock:
+            self._watches[source] = [probe, interval, 0.0, None]
+
+    def _probe(self, sources: tuple[str, ...]):
+        for source in sources:
+            with self._lock:
+                watch = self._watches.get(source)
+                if watch is None or watch[2] > time.monotonic():
+                    continue
+                watch[2] = time.monotonic() + watch[1]  # one prober per interval
+            value = self._safe("probe", watch[0])
+            if value is not None and value != watch[3]:
+                if watch[3] is not None:
+                    self.bump(source)
+                watch[3] = value
+
+    def get(self, name: str, params: tuple, sources: tuple[str, ...], compute: Callable[[], bytes]) -> bytes:
+        """Cached body of endpoint *name* for *params*, computed with
+        ``compute()`` when missing or when a source has moved on."""
+        if self.ttl <= 0:
+            return compute()
+        self._probe(sources)
+        epochs = self._safe("lookup", self.store.epochs, sources)
+        if epochs is None:
+            return compute()
+        key = f"{name}:{params!r}:{epochs}"
+        body = self._safe("lookup", self.store.get, key)
+        if body is not None:
+            self._count("hits")
+            return body
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait(self.wait)
+            if flight.body is not None:
+                self._count("waits")
+                return flight.body
+            self._count("misses")
+            return compute()
+
+        self._count("misses")
+        try:
+            flight.body = self._compute_shared(key, compute)
+            return flight.body
+        finally:
+            flight.done.set()
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def _compute_shared(self, key: str, compute: Callable[[], bytes]) -> bytes:
+        """Compute and store *key*, or take it from the process holding its
+        lock if that one finishes within ``wait`` seconds."""
+        locked = self._safe("lock", self.store.lock, key, self.wait)
+        if locked is False:
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                body = self._safe("lookup", self.store.get, key)
+                if body is not None:
+                    return body
+        try:
+            body = compute()
+            self._safe("store", self.store.set, key, body, self.ttl)
+            return body
+        finally:
+            if locked:
+                self._safe("unlock", self.store.unlock, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["waits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["waits"]) / lookups, 3) if lookups else None
+        try:
+            stats.update(self.store.stats())
+        except Exception as exc:  # noqa: BLE001
+            stats["store_error"] = str(exc)
+        return stats
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,141 @@
+"""Min/avg/max rollup tiers of the metrics table for long time ranges.
+
+Each tier is a TimescaleDB continuous aggregate over ``metrics`` keyed by
+``(bucket, series_id)``. Aggregates are real-time
+(``materialized_only = false``), so buckets the refresh policy has not reached
+yet are computed from raw rows at query time. Without TimescaleDB no tiers
+exist and every query reads the raw table.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import NamedTuple
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, Table, text
+
+from database import engine, metrics_table
+
+# Raw sample spacing; matches collector.COLLECT_INTERVAL.
+RAW_RESOLUTION = int(os.getenv("COLLECT_INTERVAL", "60"))
+
+# Default number of points a time-series response should stay under.
+METRICS_MAX_POINTS = int(os.getenv("METRICS_MAX_POINTS", "1000"))
+
+
+class RollupTier(NamedTuple):
+    name: str
+    seconds: int
+    bucket: str  # bucket width
+    start_offset: str  # refresh policy window
+    end_offset: str
+    schedule: str
+
+
+TIERS = (
+    RollupTier("metrics_5m", 300, "5 minutes", "3 hours", "5 minutes", "5 minutes"),
+    RollupTier("metrics_1h", 3600, "1 hour", "2 days", "1 hour", "30 minutes"),
+    RollupTier("metrics_1d", 86400, "1 day", "7 days", "1 day", "12 hours"),
+)
+
+# Views are created by setup_rollups, never by metadata.create_all.
+rollup_metadata = MetaData()
+rollup_tables = {
+    tier.name: Table(
+        tier.name,
+        rollup_metadata,
+        Column("bucket", DateTime(timezone=True)),
+        Column("series_id", Integer),
+        Column("value_min", Float),
+        Column("value_avg", Float),
+        Column("value_max", Float),
+    )
+    for tier in TIERS
+}
+
+
+def setup_rollups(conn) -> list[str]:
+    """Create missing continuous aggregates and (re)apply their refresh policies.
+
+    Returns the names of newly created aggregates; they hold no data until
+    ``refresh_rollups`` has run on them.
+    """
+    created = []
+    for tier in TIERS:
+        exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": tier.name}).scalar()
+        if not exists:
+            conn.execute(
+                text(
+                    f"CREATE MATERIALIZED VIEW {tier.name} "
+                    "WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+                    f"SELECT time_bucket(INTERVAL '{tier.bucket}', timestamp) AS bucket, series_id, "
+                    "min(value) AS value_min, avg(value) AS value_avg, max(value) AS value_max "
+                    "FROM metrics GROUP BY bucket, series_id WITH NO DATA"
+                )
+            )
+            created.append(tier.name)
+        conn.execute(
+            text("SELECT remove_continuous_aggregate_policy(:name, if_exists => TRUE)"),
+            {"name": tier.name},
+        )
+        conn.execute(
+            text(
+                "SELECT add_continuous_aggregate_policy(:name, "
+                "start_offset => CAST(:start AS INTERVAL), end_offset => CAST(:end AS INTERVAL), "
+                "schedule_interval => CAST(:schedule AS INTERVAL))"
+            ),
+            {"name": tier.name, "start": tier.start_offset, "end": tier.end_offset, "schedule": tier.schedule},
+        )
+    return created
+
+
+def refresh_rollups(names: list[str]):
+    """Materialize the full history of *names* (outside any transaction)."""
+    if not names:
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in names:
+            print(f"[DB] materializing rollup {name}...")
+            conn.execute(text(f"CALL refresh_continuous_aggregate('{name}', NULL, NULL)"))
+
+
+_available: list[RollupTier] | None = None
+
+
+def available_tiers() -> list[RollupTier]:
+    """Tiers that exist in the database; cached once all of them are present."""
+    global _available
+    if _available is not None:
+        return _available
+    with engine.connect() as conn:
+        names = conn.execute(
+            text("SELECT " + ", ".join(f"to_regclass('{t.name}')" for t in TIERS))
+        ).one()
+    tiers = [tier for tier, name in zip(TIERS, names) if name]
+    if len(tiers) == len(TIERS):
+        _available = tiers
+    return tiers
+
+
+class MetricSource(NamedTuple):
+    """Columns to read a metric series from, raw or rolled up."""
+
+    timestamp: object
+    series_id: object
+    value: object
+    resolution: int  # seconds per point
+
+
+def metric_source(span_seconds: float, max_points: int = METRICS_MAX_POINTS) -> MetricSource:
+    """Pick the finest resolution whose point count over *span_seconds* stays
+    within *max_points*, falling back to the coarsest tier available.
+    ``max_points <= 0`` always reads raw rows."""
+    raw = MetricSource(metrics_table.c.timestamp, metrics_table.c.series_id, metrics_table.c.value, RAW_RESOLUTION)
+    if max_points <= 0 or span_seconds / RAW_RESOLUTION <= max_points:
+        return raw
+    tiers = available_tiers()
+    for tier in tiers:
+        if span_seconds / tier.seconds <= max_points or tier is tiers[-1]:
+            t = rollup_tables[tier.name]
+            return MetricSource(t.c.bucket, t.c.series_id, t.c.value_avg, tier.seconds)
+    return raw
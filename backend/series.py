@@ -0,0 +1,158 @@
+"""In-process cache of the ``series`` dictionary.
+
+Metric rows reference their ``(host_id, item_key)`` through a small integer
+``series_id``. The collector resolves (and creates) ids for the rows it writes,
+the query endpoints resolve a host's keys to ids, and both keep the mapping
+in memory. Lookups that miss reload it from the table, and it is reloaded
+at least every ``SERIES_CACHE_TTL`` seconds.
+
+The cache is also the host/key catalog (``catalog()``). For that, series
+created by another process (a separate collector) must show up quickly:
+at most every ``SERIES_CACHE_CHECK`` seconds ``max(id)`` of the table is
+compared with the largest cached id, and only the newer rows are loaded, so
+a catalog lookup costs O(series) memory reads instead of a metrics scan.
+Series whose newest sample (``last_seen``) is older than ``METRICS_RETENTION``
+have no data left and are left out of the catalog; that is re-evaluated on
+every full reload, as series only expire over days.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Iterable
+
+from sqlalchemy import cast, false, func, select, text
+from sqlalchemy.dialects.postgresql import INTERVAL
+
+from database import METRICS_RETENTION, engine, series_table
+
+SERIES_CACHE_TTL = float(os.getenv("SERIES_CACHE_TTL", "300"))  # seconds
+SERIES_CACHE_CHECK = float(os.getenv("SERIES_CACHE_CHECK", "5"))  # seconds between new-series checks
+
+_CREATE = text(
+    "INSERT INTO series (host_id, item_key) "
+    "SELECT * FROM unnest(CAST(:hosts AS text[]), CAST(:keys AS text[])) "
+    "ON CONFLICT (host_id, item_key) DO NOTHING"
+)
+_LOOKUP = text(
+    "SELECT s.id, s.host_id, s.item_key FROM series s "
+    "JOIN unnest(CAST(:hosts AS text[]), CAST(:keys AS text[])) AS u(host_id, item_key) "
+    "USING (host_id, item_key)"
+)
+
+
+class SeriesCache:
+    """``(host_id, item_key) <-> series_id`` mapping, shared by all threads."""
+
+    def __init__(self, ttl: float = SERIES_CACHE_TTL, check: float = SERIES_CACHE_CHECK):
+        self.ttl = ttl
+        self.check = check
+        self._ids: dict[tuple[str, str], int] = {}
+        self._keys: dict[int, tuple[str, str]] = {}
+        self._by_host: dict[str, dict[str, int]] = {}
+        self._max_id = 0
+        self._expired: set[int] = set()  # ids whose samples are past retention
+        self._absent: set[tuple[str, str]] = set()  # looked up without create, not in the table
+        self._loaded = 0.0  # monotonic time of the last full load
+        self._checked = 0.0  # monotonic time of the last new-series check
+        self._lock = threading.Lock()
+
+    def _add(self, series_id: int, host_id: str, item_key: str):
+        self._ids[(host_id, item_key)] = series_id
+        self._keys[series_id] = (host_id, item_key)
+        self._by_host.setdefault(host_id, {})[item_key] = series_id
+        self._max_id = max(self._max_id, series_id)
+        self._absent.discard((host_id, item_key))
+
+    def reload(self):
+        """Load the whole series table."""
+        s = series_table.c
+        expired = false()
+        if METRICS_RETENTION:
+            expired = s.last_seen < func.now() - cast(METRICS_RETENTION, INTERVAL)
+        with engine.connect() as conn:
+            rows = conn.execute(select(s.id, s.host_id, s.item_key, expired)).all()
+        with self._lock:
+            for series_id, host_id, item_key, _ in rows:
+                self._add(series_id, host_id, item_key)
+            self._expired = {row[0] for row in rows if row[3]}
+            self._absent.clear()
+            self._loaded = self._checked = time.monotonic()
+
+    def refresh(self):
+        """Load series added since the last load; a full reload once stale.
+        Checks the table at most every ``check`` seconds."""
+        if self._stale():
+            return self.reload()
+        if time.monotonic() - self._checked < self.check:
+            return
+        s = series_table.c
+        with engine.connect() as conn:
+            newest = conn.execute(select(func.max(s.id))).scalar() or 0
+            rows = []
+            if newest > self._max_id:
+                rows = conn.execute(select(s.id, s.host_id, s.item_key).where(s.id > self._max_id)).all()
+        with self._lock:
+            for row in rows:
+                self._add(*row)
+            if rows:
+                self._absent.clear()  # may have been created elsewhere
+            self._checked = time.monotonic()
+
+    def _stale(self) -> bool:
+        return time.monotonic() - self._loaded > self.ttl
+
+    def ids(self, pairs: Iterable[tuple[str, str]], create: bool = True) -> list[int | None]:
+        """Series id of every ``(host_id, item_key)``, creating missing series
+        unless *create* is false (then unknown ones map to ``None``; that is
+        remembered until the next ``refresh`` sees new series)."""
+        pairs = list(pairs)
+        if not create and self._absent:
+            self.refresh()
+        missing = {p for p in pairs if p not in self._ids and (create or p not in self._absent)}
+        if missing:
+            hosts, keys = [h for h, _ in missing], [k for _, k in missing]
+            with engine.begin() as conn:
+                if create:
+                    conn.execute(_CREATE, {"hosts": hosts, "keys": keys})
+                found = conn.execute(_LOOKUP, {"hosts": hosts, "keys": keys}).all()
+            with self._lock:
+                for row in found:
+                    self._add(*row)
+                if not create:
+                    self._absent.update(p for p in missing if p not in self._ids)
+        return [self._ids.get(p) for p in pairs]
+
+    def host_series(self, host_id: str) -> dict[str, int]:
+        """``item_key -> series_id`` for every stored series of *host_id*."""
+        # Unknown hosts trigger a reload too, but at most once a second
+        if self._stale() or (host_id not in self._by_host and time.monotonic() - self._loaded > 1):
+            self.reload()
+        else:
+            self.refresh()
+        return dict(self._by_host.get(host_id, {}))
+
+    def catalog(self) -> dict[str, list[str]]:
+        """``host_id -> sorted item keys`` of every series with data within
+        the retention period."""
+        self.refresh()
+        with self._lock:
+            catalog = {
+                host_id: sorted(k for k, series_id in keys.items() if series_id not in self._expired)
+                for host_id, keys in self._by_host.items()
+            }
+        return {host_id: keys for host_id, keys in catalog.items() if keys}
+
+    def keys(self, series_ids: Iterable[int]) -> list[tuple[str, str] | None]:
+        """``(host_id, item_key)`` of every id; ``None`` for ids not in the
+        table (e.g. stale ids of deleted series)."""
+        series_ids = list(series_ids)
+        # Unknown ids trigger a reload, but at most once a second
+        if any(i not in self._keys for i in series_ids) and time.monotonic() - self._loaded > 1:
+            self.reload()
+        return [self._keys.get(i) for i in series_ids]
+
+
+series_cache = SeriesCache()
@@ -0,0 +1,145 @@
+"""Generic reads of metric series by host and item-key pattern.
+
+Keys are exact Zabbix item keys or glob patterns (``*`` any run of
+characters, ``?`` one character, e.g. ``net.if.in*``). They are matched in
+SQL against the *series* dictionary with ``LIKE``, which the
+``ix_series_host_key_pattern`` index (``text_pattern_ops``) serves for
+patterns with a literal prefix, so new item keys need no code changes and
+nothing is filtered in Python. With an aggregate, all series a pattern
+matches on a host are combined per timestamp in SQL (for example the
+traffic of every interface summed); without one each series is returned on
+its own under its item key.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import BigInteger, Integer, and_, cast, column, func, or_, select, values
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from database import engine, series_table
+from downsample import lttb_indices
+from rollups import METRICS_MAX_POINTS, metric_source
+
+AGGREGATES = {"sum": func.sum, "max": func.max, "min": func.min, "avg": func.avg}
+
+
+def is_pattern(key: str) -> bool:
+    return "*" in key or "?" in key
+
+
+def like_pattern(key: str) -> str:
+    """Glob *key* as a ``LIKE`` pattern with ``\\`` as escape character."""
+    escaped = key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+@lru_cache(maxsize=1024)
+def _glob_regex(pattern: str) -> re.Pattern:
+    return re.compile("".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern), re.DOTALL)
+
+
+def glob_match(item_key: str, pattern: str) -> bool:
+    """Whether *item_key* matches glob *pattern* the way ``like_pattern``
+    matches it in SQL: only ``*`` and ``?`` are wildcards, so the brackets of
+    keys like ``net.if.in[*]`` are literal (unlike ``fnmatch``)."""
+    return _glob_regex(pattern).fullmatch(item_key) is not None
+
+
+def match_series(conn, hosts: Iterable[str], keys: Iterable[str]) -> list[tuple[int, str, str, str]]:
+    """``(series_id, host_id, item_key, requested key)`` for every series of
+    *hosts* matching one of *keys*; a series matching several keys is listed
+    once per key."""
+    hosts, keys = list(hosts), list(keys)
+    s = series_table.c
+    conditions = [s.item_key.like(like_pattern(k), escape="\\") if is_pattern(k) else s.item_key == k for k in keys]
+    stmt = select(s.id, s.host_id, s.item_key).where(and_(s.host_id.in_(hosts), or_(*conditions)))
+    matched = []
+    for series_id, host_id, item_key in conn.execute(stmt):
+        for key in keys:
+            if glob_match(item_key, key) if is_pattern(key) else item_key == key:
+                matched.append((series_id, host_id, item_key, key))
+    return matched
+
+
+def read_series(
+    hosts: Iterable[str],
+    keys: Iterable[str],
+    hours: int = 24,
+    max_points: int = METRICS_MAX_POINTS,
+    agg: str | None = None,
+) -> dict[str, dict[str, dict[str, list]]]:
+    """Recent samples grouped per host: ``{host_id: {name: {"timestamp":
+    [...], "value": [...]}}}`` with timestamps in epoch milliseconds.
+
+    Without *agg*, *name* is the item key of each matched series. With *agg*
+    (one of ``AGGREGATES``) it is the requested key or pattern, and the value
+    at each timestamp aggregates every series it matched on that host. Data
+    comes from the rollup tier that fits *max_points* (whose values are
+    bucket averages); each host's series then share *max_points* and are
+    downsampled with LTTB (evenly spaced points where a share is below the
+    3 LTTB needs). Hosts and keys without data are left out of the host's
+    mapping. Raises ``ValueError`` if a host has more series than
+    *max_points*, as the budget cannot then be kept.
+    """
+    if agg is not None and agg not in AGGREGATES:
+        raise ValueError(f"unknown aggregate {agg!r}")
+    hosts, keys = list(dict.fromkeys(hosts)), list(dict.fromkeys(keys))
+    result: dict[str, dict] = {h: {} for h in hosts}
+    if not hosts or not keys:
+        return result
+
+    since = datetime.utcnow() - timedelta(hours=hours)
+    src = metric_source(hours * 3600, max_points)
+    with engine.connect() as conn:
+        # One output group per series, or per (host, requested key) when aggregating
+        groups: dict[tuple[str, str], int] = {}
+        members: dict[tuple[int, int], None] = {}
+        for series_id, host_id, item_key, key in match_series(conn, hosts, keys):
+            name = key if agg else item_key
+            members[(series_id, groups.setdefault((host_id, name), len(groups)))] = None
+        if not members:
+            return result
+        per_host = Counter(host_id for host_id, _ in groups)
+        if max_points > 0 and max(per_host.values()) > max_points:
+            host_id, count = per_host.most_common(1)[0]
+            raise ValueError(f"max_points={max_points} is less than the {count} series of host {host_id}")
+
+        g = values(column("series_id", Integer), column("grp", Integer), name="g").data(list(members))
+        per_ts = (
+            select(g.c.grp, src.timestamp.label("ts"), src.value.label("value"))
+            .join_from(src.series_id.table, g, g.c.series_id == src.series_id)
+            # The IN list lets the planner use the (series_id, timestamp) index
+            .where(and_(src.series_id.in_({sid for sid, _ in members}), src.timestamp >= since))
+        )
+        if agg:
+            per_ts = per_ts.with_only_columns(
+                g.c.grp, src.timestamp.label("ts"), AGGREGATES[agg](src.value).label("value")
+            ).group_by(g.c.grp, src.timestamp)
+        per_ts = per_ts.subquery()
+        epoch_ms = cast(func.round(func.extract("epoch", per_ts.c.ts) * 1000), BigInteger)
+        stmt = select(
+            per_ts.c.grp,
+            func.array_agg(aggregate_order_by(epoch_ms, per_ts.c.ts)),
+            func.array_agg(aggregate_order_by(per_ts.c.value, per_ts.c.ts)),
+        ).group_by(per_ts.c.grp)
+        rows = conn.execute(stmt).all()
+
+    names = {grp: host_name for host_name, grp in groups.items()}
+    for grp, ts, vals in rows:
+        host_id, name = names[grp]
+        budget = max_points // per_host[host_id]
+        if max_points > 0 and len(ts) > budget:
+            if budget >= 3:
+                keep = lttb_indices(np.asarray(ts, dtype=np.float64), np.asarray(vals, dtype=np.float64), budget)
+            else:
+                keep = np.linspace(0, len(ts) - 1, budget).astype(np.int64)
+            ts, vals = [ts[i] for i in keep], [vals[i] for i in keep]
+        result[host_id][name] = {"timestamp": ts, "value": vals}
+    return result
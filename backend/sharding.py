@@ -0,0 +1,117 @@
+"""Host shards shared by several collector processes through a lease table.
+
+Hosts are split into ``COLLECTOR_SHARDS`` stable shards
+(``crc32(hostid) % COLLECTOR_SHARDS``). Every collector instance heartbeats
+into ``collector_members`` and holds leases on a fair share of the shards
+(``ceil(shards / live members)``) in ``collector_leases``. It renews them
+every cycle, claims free or expired ones, and gives back the ones above its
+share so a new instance can pick them up. Leases expire after
+``COLLECTOR_LEASE_TTL`` seconds, so shards of a crashed instance move on
+their own. A sample fetched twice during a hand-over is dropped by the
+unique series/time index.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import socket
+import zlib
+
+from sqlalchemy import text
+
+from database import engine
+
+COLLECTOR_SHARDS = int(os.getenv("COLLECTOR_SHARDS", "1"))
+COLLECTOR_LEASE_TTL = int(os.getenv("COLLECTOR_LEASE_TTL", str(3 * int(os.getenv("COLLECT_INTERVAL", "60")))))
+
+_TTL = "make_interval(secs => :ttl)"
+
+
+def shard_of(host_id: str, shards: int) -> int:
+    """Stable shard of a host id."""
+    return zlib.crc32(str(host_id).encode()) % shards
+
+
+def default_instance() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardLease:
+    """The shards this collector instance currently owns."""
+
+    def __init__(self, shards: int = COLLECTOR_SHARDS, instance: str | None = None, ttl: int = COLLECTOR_LEASE_TTL):
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        self.shards = shards
+        self.instance = instance or default_instance()
+        self.ttl = ttl
+        self.owned: frozenset[int] = frozenset()
+
+    def renew(self) -> frozenset[int]:
+        """Heartbeat, renew owned leases and rebalance; returns owned shards."""
+        params = {"me": self.instance, "ttl": self.ttl, "n": self.shards}
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO collector_leases (shard) SELECT generate_series(0, :n - 1) "
+                    "ON CONFLICT (shard) DO NOTHING"
+                ),
+                params,
+            )
+            conn.execute(
+                text(
+                    "INSERT INTO collector_members (instance, heartbeat) VALUES (:me, now()) "
+                    "ON CONFLICT (instance) DO UPDATE SET heartbeat = now()"
+                ),
+                params,
+            )
+            conn.execute(text(f"DELETE FROM collector_members WHERE heartbeat < now() - {_TTL}"), params)
+            members = conn.execute(text("SELECT count(*) FROM collector_members")).scalar()
+            target = math.ceil(self.shards / max(members, 1))
+
+            owned = conn.execute(
+                text(
+                    f"UPDATE collector_leases SET expires_at = now() + {_TTL} "
+                    "WHERE owner = :me AND shard < :n RETURNING shard"
+                ),
+                params,
+            ).scalars().all()
+            owned = sorted(owned)
+            if len(owned) > target:
+                extra = owned[target:]
+                conn.execute(
+                    text("UPDATE collector_leases SET owner = NULL, expires_at = NULL WHERE shard = ANY(:extra)"),
+                    {"extra": extra},
+                )
+                owned = owned[:target]
+            elif len(owned) < target:
+                owned += conn.execute(
+                    text(
+                        f"UPDATE collector_leases SET owner = :me, expires_at = now() + {_TTL} "
+                        "WHERE shard IN (SELECT shard FROM collector_leases "
+                        "WHERE shard < :n AND (owner IS NULL OR expires_at < now()) "
+                        "ORDER BY shard LIMIT :want FOR UPDATE SKIP LOCKED) "
+                        "RETURNING shard"
+                    ),
+                    {**params, "want": target - len(owned)},
+                ).scalars().all()
+        owned = frozenset(owned)
+        if owned != self.owned:
+            print(f"[Sharding] {self.instance} owns shards {sorted(owned)} of {self.shards}")
+        self.owned = owned
+        return owned
+
+    def release(self):
+        """Give back all leases and leave the member list."""
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE collector_leases SET owner = NULL, expires_at = NULL WHERE owner = :me"),
+                {"me": self.instance},
+            )
+            conn.execute(text("DELETE FROM collector_members WHERE instance = :me"), {"me": self.instance})
+        self.owned = frozenset()
+
+    def filter_hosts(self, hosts: list[dict]) -> list[dict]:
+        """The hosts that belong to an owned shard."""
+        return [h for h in hosts if shard_of(h["hostid"], self.shards) in self.owned]
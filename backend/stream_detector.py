@@ -0,0 +1,141 @@
+"""Streaming anomaly detection on the collector's rows as they arrive.
+
+Each series keeps a ring buffer of its last ``STREAM_WINDOW`` values plus a
+sliding-window Welford mean / sum of squared deviations, all stored in
+NumPy arrays indexed by a small per-series slot. Checking a point is O(1): it
+is compared with the window's mean and standard deviation *before* being
+added, using the same 3-sigma rule as the polling ``AnomalyDetector``.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import select
+
+from anomaly_detector import publish_anomalies, record_anomalies
+from database import engine, metrics_table, series_table
+
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "60"))  # points per series
+STREAM_MIN_SAMPLES = int(os.getenv("STREAM_MIN_SAMPLES", "10"))
+STREAM_SIGMA = float(os.getenv("STREAM_SIGMA", "3"))
+STREAM_COOLDOWN = int(os.getenv("STREAM_COOLDOWN", "3600"))  # seconds between reports per series
+
+
+class StreamingDetector:
+    """Per-series online 3-sigma detector fed directly by the collector."""
+
+    def __init__(
+        self,
+        window: int = STREAM_WINDOW,
+        min_samples: int = STREAM_MIN_SAMPLES,
+        sigma: float = STREAM_SIGMA,
+        cooldown: int = STREAM_COOLDOWN,
+        capacity: int = 1024,
+    ):
+        self.window = window
+        self.min_samples = max(min_samples, 2)
+        self.sigma = sigma
+        self.cooldown = cooldown
+        self._slots: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        self._values = np.zeros((capacity, self.window))
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._head = np.zeros(capacity, dtype=np.int64)  # next write position
+        self._mean = np.zeros(capacity)
+        self._m2 = np.zeros(capacity)  # sum of squared deviations from the mean
+        self._last_report = np.full(capacity, -np.inf)
+
+    def _grow(self):
+        old = (self._values, self._count, self._head, self._mean, self._m2, self._last_report)
+        n = len(self._count)
+        self._alloc(n * 2)
+        for new, prev in zip(
+            (self._values, self._count, self._head, self._mean, self._m2, self._last_report), old
+        ):
+            new[:n] = prev
+
+    def _slot(self, key: tuple[str, str]) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._slots)
+            if slot == len(self._count):
+                self._grow()
+            self._slots[key] = slot
+        return slot
+
+    def _push(self, i: int, x: float):
+        """Add *x* to series *i*'s window, evicting the oldest value when full."""
+        n, head, mean = self._count[i], self._head[i], self._mean[i]
+        if n < self.window:
+            n += 1
+            new_mean = mean + (x - mean) / n
+            self._m2[i] += (x - mean) * (x - new_mean)
+            self._count[i] = n
+        else:
+            old = self._values[i, head]
+            new_mean = mean + (x - old) / n
+            self._m2[i] = max(self._m2[i] + (x - old) * (x - new_mean + old - mean), 0.0)
+        self._mean[i] = new_mean
+        self._values[i, head] = x
+        self._head[i] = (head + 1) % self.window
+
+    def process(self, rows: Iterable[dict], report: bool = True) -> list[dict]:
+        """Check and absorb collector rows; return (and store) new anomalies.
+
+        With ``report=False`` rows only warm up the state.
+        """
+        found = []
+        with self._lock:
+            for row in rows:
+                i = self._slot((row["host_id"], row["item_key"]))
+                x = float(row["value"])
+                n = self._count[i]
+                if report and n >= self.min_samples:
+                    mean = self._mean[i]
+                    std = (self._m2[i] / (n - 1)) ** 0.5
+                    ts = row["timestamp"].timestamp()
+                    if (
+                        std > 0
+                        and abs(x - mean) > self.sigma * std
+                        and ts - self._last_report[i] >= self.cooldown
+                    ):
+                        self._last_report[i] = ts
+                        found.append(
+                            {
+                                "host_id": row["host_id"],
+                                "item_key": row["item_key"],
+                                "value": x,
+                                "timestamp": row["timestamp"],
+                                "reason": f"3-sigma rule (mean={mean:.2f}, stddev={std:.2f})",
+                            }
+                        )
+                self._push(i, x)
+        if found:
+            with engine.begin() as conn:
+                stored = record_anomalies(conn, found)
+            publish_anomalies(stored)
+            for a in found:
+                print(f"[StreamingDetector] New anomaly detected for {a['host_id']}/{a['item_key']}: value {a['value']:.2f}")
+        return found
+
+    def warm_up(self, hours: int = 1):
+        """Seed the windows from the last *hours* of stored metrics."""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        m, s = metrics_table.c, series_table.c
+        stmt = (
+            select(s.host_id, s.item_key, m.value, m.timestamp)
+            .join_from(metrics_table, series_table, s.id == m.series_id)
+            .where(m.timestamp >= since)
+            .order_by(m.timestamp)
+        )
+        with engine.connect() as conn:
+            self.process(conn.execute(stmt).mappings(), report=False)
+        print(f"[StreamingDetector] warmed up {len(self._slots)} series")
@@ -0,0 +1,24 @@
+"""Detector selection of ``anomaly_engine`` (no database needed)."""
+
+from __future__ import annotations
+
+from anomaly_engine import AnomalyEngine, parse_algorithms
+
+
+def test_parse_algorithms_appends_default():
+    assert parse_algorithms("net.if.in[*]=mad") == [("net.if.in[*]", "mad"), ("*", "three_sigma")]
+
+
+def test_algorithm_for_bracketed_keys():
+    engine = AnomalyEngine("net.if.in[*]=mad;vm.memory.size[avail*]=seasonal;system.cpu.util=isolation_forest")
+    assert engine.algorithm_for("net.if.in[eth0]") == "mad"
+    assert engine.algorithm_for("vm.memory.size[available]") == "seasonal"
+    assert engine.algorithm_for("vm.memory.size[total]") == "three_sigma"
+    assert engine.algorithm_for("system.cpu.util") == "isolation_forest"
+    assert engine.algorithm_for("net.if.out[eth0]") == "three_sigma"
+
+
+def test_first_matching_rule_wins():
+    engine = AnomalyEngine("net.if.in[eth0]=seasonal;net.if.*=mad")
+    assert engine.algorithm_for("net.if.in[eth0]") == "seasonal"
+    assert engine.algorithm_for("net.if.in[eth1]") == "mad"
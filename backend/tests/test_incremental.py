@@ -0,0 +1,111 @@
+"""High-water marks and bounded backfill of ``incremental`` (no database or
+Zabbix needed)."""
+
+from __future__ import annotations
+
+import incremental
+from incremental import BACKFILL_CHUNK, HistoryTracker, sample_time
+
+NOW = 1_699_999_200  # a multiple of 3600
+
+
+class FakeAPI:
+    """Answers history.get / trend.get from ``{itemid: [(clock, ns), ...]}``."""
+
+    def __init__(self, samples: dict[str, list[tuple[int, int]]]):
+        self.samples = samples
+        self.calls: list[tuple[str, int, int]] = []
+
+    def map(self, fn, jobs):
+        return [fn(job) for job in jobs]
+
+    def history_get(self, item_ids, history, time_from, time_till):
+        self.calls.append(("history", time_from, time_till))
+        return [
+            {"itemid": i, "clock": str(c), "ns": str(ns), "value": "1"}
+            for i in item_ids
+            for c, ns in self.samples.get(i, [])
+            if time_from <= c <= time_till
+        ]
+
+    def trends_get(self, item_ids, time_from, time_till):
+        self.calls.append(("trend", time_from, time_till))
+        return [
+            {"itemid": i, "clock": str(c), "value_avg": "1"}
+            for i in item_ids
+            for c, _ in self.samples.get(i, [])
+            if time_from <= c <= time_till and c % 3600 == 0
+        ]
+
+
+class Tracker(HistoryTracker):
+    def __init__(self, stored: dict[tuple[str, str], int]):
+        super().__init__()
+        self.stored = stored
+
+    def _stored_marks(self):
+        return {hk: (clock, 0) for hk, clock in self.stored.items()}
+
+
+def item(itemid: str, lastclock: int, lastns: int = 0) -> dict:
+    return {"itemid": itemid, "hostid": "h", "key_": f"k{itemid}", "value_type": "0",
+            "lastclock": str(lastclock), "lastns": str(lastns)}
+
+
+def test_backfill_is_spread_over_cycles(monkeypatch):
+    monkeypatch.setattr(incremental, "BACKFILL_CHUNKS_PER_CYCLE", 24)
+    start = NOW - 3 * 86400
+    api = FakeAPI({"1": [(c, 0) for c in range(start, NOW + 1, 60)]})
+    tracker = Tracker({("h", "k1"): start})
+
+    rows = tracker.collect(api, [item("1", NOW)], NOW)
+    assert len(api.calls) == 24
+    assert rows[0]["timestamp"] == sample_time(start + 60, 0)
+    assert rows[-1]["timestamp"] < sample_time(start + 86400, 0)
+
+    tracker.committed(rows)
+    rows = tracker.collect(api, [item("1", NOW)], NOW)
+    assert rows[0]["timestamp"] == sample_time(start + 86400, 0)  # continues where the last cycle stopped
+
+
+def test_uncommitted_rows_are_fetched_again():
+    api = FakeAPI({"1": [(NOW - 120, 0), (NOW - 60, 0)]})
+    tracker = Tracker({("h", "k1"): NOW - 180})
+    first = tracker.collect(api, [item("1", NOW - 60)], NOW)
+    assert len(first) == 2
+    assert tracker.collect(api, [item("1", NOW - 60)], NOW) == first  # never committed
+    tracker.committed(first)
+    assert tracker.collect(api, [item("1", NOW - 60)], NOW) == []
+
+
+def test_items_without_samples_move_past_the_fetched_windows(monkeypatch):
+    monkeypatch.setattr(incremental, "BACKFILL_CHUNKS_PER_CYCLE", 2)
+    start = NOW - 86400
+    api = FakeAPI({"1": [(NOW - 60, 0)]})
+    tracker = Tracker({("h", "k1"): start})
+    assert tracker.collect(api, [item("1", NOW - 60)], NOW) == []
+    assert tracker.marks["1"][0] == start + 2 * BACKFILL_CHUNK - 1
+    tracker.collect(api, [item("1", NOW - 60)], NOW)
+    assert api.calls[-1][1] == start + 3 * BACKFILL_CHUNK - 1  # not the same windows again
+
+
+def test_later_sample_in_the_same_second_is_kept():
+    api = FakeAPI({"1": [(NOW - 60, 100_000), (NOW - 60, 500_000_000)]})
+    tracker = Tracker({})
+    tracker.marks["1"] = (NOW - 60, 100_000)
+    tracker._itemids[("h", "k1")] = "1"
+    rows = tracker.collect(api, [item("1", NOW - 60, 500_000_000)], NOW)
+    assert [r["timestamp"] for r in rows] == [sample_time(NOW - 60, 500_000_000)]
+    tracker.committed(rows)
+    assert tracker.collect(api, [item("1", NOW - 60, 500_000_000)], NOW) == []
+
+
+def test_windows_past_zabbix_history_use_trends(monkeypatch):
+    monkeypatch.setattr(incremental, "BACKFILL_CHUNKS_PER_CYCLE", 1000)
+    monkeypatch.setattr(incremental, "ZABBIX_HISTORY_DAYS", 1)
+    start = NOW - 2 * 86400
+    api = FakeAPI({"1": [(c, 0) for c in range(start, NOW + 1, 600)]})
+    rows = Tracker({("h", "k1"): start}).collect(api, [item("1", NOW)], NOW)
+    kinds = [kind for kind, _, _ in api.calls]
+    assert "trend" in kinds and "history" in kinds
+    assert len(rows) == 23 + 6 * 24 + 1  # hourly trends, then every raw sample
@@ -0,0 +1,181 @@
+"""Concurrency and invalidation behaviour of ``response_cache``.
+
+No database or Redis needed; run from ``backend/`` with ``python -m pytest tests``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from response_cache import LocalStore, ResponseCache
+
+
+class SharedStore(LocalStore):
+    """A local store whose flight lock another process may hold, like
+    ``RedisStore`` shared between workers."""
+
+    def __init__(self, locked_elsewhere: bool = False):
+        super().__init__()
+        self.locked_elsewhere = locked_elsewhere
+        self.unlocked: list[str] = []
+
+    def lock(self, key: str, timeout: float) -> bool:
+        return not self.locked_elsewhere
+
+    def unlock(self, key: str):
+        self.unlocked.append(key)
+
+
+class BrokenStore(LocalStore):
+    def get(self, key: str):
+        raise ConnectionError("store down")
+
+
+def _run_concurrently(n: int, fn) -> list:
+    results, start = [None] * n, threading.Barrier(n)
+
+    def worker(i):
+        start.wait()
+        try:
+            results[i] = fn()
+        except Exception as exc:  # noqa: BLE001
+            results[i] = exc
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_hit_after_miss_and_epoch_bump_invalidates():
+    cache, calls = ResponseCache(LocalStore(), ttl=30), []
+
+    def compute():
+        calls.append(1)
+        return f"v{len(calls)}".encode()
+
+    assert cache.get("ep", (1,), ("metrics",), compute) == b"v1"
+    assert cache.get("ep", (1,), ("metrics",), compute) == b"v1"
+    assert cache.get("ep", (2,), ("metrics",), compute) == b"v2"  # other parameters
+    cache.bump("alerts")  # unrelated source
+    assert cache.get("ep", (1,), ("metrics",), compute) == b"v1"
+    cache.bump("metrics")
+    assert cache.get("ep", (1,), ("metrics",), compute) == b"v3"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+
+
+def test_single_flight_computes_once():
+    cache, calls = ResponseCache(LocalStore(), ttl=30), []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return b"body"
+
+    results = _run_concurrently(20, lambda: cache.get("ep", (), ("metrics",), slow))
+    assert results == [b"body"] * 20
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["misses"] + stats["waits"] + stats["hits"] == 20
+    assert stats["misses"] == 1
+
+
+def test_waiters_compute_themselves_when_the_leader_fails():
+    cache, calls, lock = ResponseCache(LocalStore(), ttl=30), [], threading.Lock()
+
+    def first_fails():
+        with lock:
+            calls.append(1)
+            n = len(calls)
+        time.sleep(0.1)
+        if n == 1:
+            raise RuntimeError("database error")
+        return b"body"
+
+    results = _run_concurrently(5, lambda: cache.get("ep", (), (), first_fails))
+    assert sum(isinstance(r, RuntimeError) for r in results) == 1
+    assert results.count(b"body") == 4
+    assert cache._flights == {}
+
+
+def test_waiter_gives_up_after_wait_timeout():
+    cache = ResponseCache(LocalStore(), ttl=30, wait=0.05)
+    release = threading.Event()
+
+    def stuck():
+        release.wait(2)
+        return b"late"
+
+    leader = threading.Thread(target=cache.get, args=("ep", (), (), stuck))
+    leader.start()
+    time.sleep(0.02)
+    t0 = time.monotonic()
+    assert cache.get("ep", (), (), lambda: b"own") == b"own"
+    assert time.monotonic() - t0 < 1
+    release.set()
+    leader.join()
+
+
+def test_takes_the_result_of_the_process_holding_the_lock():
+    store = SharedStore(locked_elsewhere=True)
+    cache = ResponseCache(store, ttl=30, wait=2)
+    key = f"ep:{()!r}:{()}"
+    threading.Timer(0.1, store.set, args=(key, b"from elsewhere", 30)).start()
+    assert cache.get("ep", (), (), lambda: pytest.fail("computed although another process was")) == b"from elsewhere"
+    assert store.unlocked == []  # not ours to release
+
+
+def test_computes_when_the_lock_holder_never_delivers():
+    store = SharedStore(locked_elsewhere=True)
+    cache = ResponseCache(store, ttl=30, wait=0.1)
+    assert cache.get("ep", (), (), lambda: b"own") == b"own"
+
+
+def test_lock_is_released_after_compute():
+    store = SharedStore()
+    cache = ResponseCache(store, ttl=30)
+    with pytest.raises(RuntimeError):
+        cache.get("ep", (), (), lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    cache.get("ep", (), (), lambda: b"ok")
+    assert len(store.unlocked) == 2
+
+
+def test_store_errors_fall_back_to_compute():
+    cache = ResponseCache(BrokenStore(), ttl=30)
+    assert cache.get("ep", (), (), lambda: b"direct") == b"direct"
+    assert cache.stats()["errors"] == 1
+
+
+def test_ttl_and_byte_limit():
+    store = LocalStore(max_bytes=1000)
+    cache = ResponseCache(store, ttl=0.05)
+    for i in range(20):
+        cache.get("ep", (i,), (), lambda: b"x" * 100)
+    stats = store.stats()
+    assert stats["bytes"] <= 1000 and stats["evictions"] > 0
+    cache.get("big", (), (), lambda: b"x" * 2000)  # larger than the whole cache: not stored
+    assert store.stats()["bytes"] <= 1000
+    time.sleep(0.06)
+    assert cache.get("ep", (19,), (), lambda: b"fresh") == b"fresh"
+
+
+def test_watch_bumps_when_the_probe_changes():
+    cache, value = ResponseCache(LocalStore(), ttl=30), [1]
+    cache.watch("metrics", lambda: value[0], interval=0)
+    assert cache.get("ep", (), ("metrics",), lambda: b"old") == b"old"
+    assert cache.get("ep", (), ("metrics",), lambda: b"new") == b"old"
+    value[0] = 2
+    assert cache.get("ep", (), ("metrics",), lambda: b"new") == b"new"
+
+
+def test_disabled_with_zero_ttl():
+    cache, calls = ResponseCache(LocalStore(), ttl=0), []
+    for _ in range(3):
+        cache.get("ep", (), (), lambda: calls.append(1) or b"x")
+    assert len(calls) == 3
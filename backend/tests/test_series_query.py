@@ -0,0 +1,57 @@
+"""Item-key pattern handling of ``series_query`` (no database needed)."""
+
+from __future__ import annotations
+
+import pytest
+
+from series_query import glob_match, is_pattern, like_pattern
+
+
+def test_is_pattern():
+    assert is_pattern("net.if.in[*]")
+    assert is_pattern("system.cpu.load[all,avg?]")
+    assert not is_pattern("net.if.in[eth0]")
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        ("net.if.in[*]", "net.if.in[%]"),
+        ("vm.memory.size[*]", "vm.memory.size[%]"),
+        ("system_cpu?", "system\\_cpu_"),
+        ("100%*", "100\\%%"),
+        ("C:\\*", "C:\\\\%"),
+    ],
+)
+def test_like_pattern_escapes_sql_wildcards(key, expected):
+    assert like_pattern(key) == expected
+
+
+@pytest.mark.parametrize(
+    "item_key, pattern",
+    [
+        ("net.if.in[eth0]", "net.if.in[*]"),
+        ("net.if.in[eth0]", "net.if.in[eth*]"),
+        ("net.if.in[eth0]", "net.if.in[eth?]"),
+        ("vm.memory.size[available]", "vm.memory.size[*]"),
+        ("net.if.in[eth0,bytes]", "net.if.*"),
+        ("icmpping", "icmpping"),
+    ],
+)
+def test_glob_match_treats_brackets_literally(item_key, pattern):
+    assert glob_match(item_key, pattern)
+
+
+@pytest.mark.parametrize(
+    "item_key, pattern",
+    [
+        ("net.if.in[eth0]", "net.if.in[lo*]"),
+        ("net.if.out[eth0]", "net.if.in[*]"),
+        ("net.if.in[eth10]", "net.if.in[eth?]"),
+        ("net.if.ine", "net.if.in[e]"),  # no character class
+        ("netXif.in[eth0]", "net.if.in[*]"),  # "." is literal
+        ("net.if.in[eth0]x", "net.if.in[*]"),
+    ],
+)
+def test_glob_match_rejects(item_key, pattern):
+    assert not glob_match(item_key, pattern)
@@ -0,0 +1,77 @@
+"""Lease acquire, expiry and release of ``sharding.ShardLease``.
+
+Needs the database of ``DB_URL`` (skipped when it is unreachable); the
+lease tables there are emptied.
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import collector_leases_table, collector_members_table, engine
+from sharding import ShardLease, shard_of
+
+
+@pytest.fixture
+def leases():
+    try:
+        with engine.begin() as conn:
+            collector_leases_table.create(conn, checkfirst=True)
+            collector_members_table.create(conn, checkfirst=True)
+            conn.execute(text("DELETE FROM collector_leases"))
+            conn.execute(text("DELETE FROM collector_members"))
+    except OperationalError as exc:
+        pytest.skip(f"database unavailable: {exc}")
+    made = []
+
+    def lease(instance: str, ttl: int = 60) -> ShardLease:
+        made.append(ShardLease(shards=4, instance=instance, ttl=ttl))
+        return made[-1]
+
+    yield lease
+    for lease_ in made:
+        lease_.release()
+
+
+def test_single_instance_takes_every_shard(leases):
+    a = leases("a")
+    assert a.renew() == {0, 1, 2, 3}
+    assert a.renew() == {0, 1, 2, 3}
+    hosts = [{"hostid": str(10000 + i)} for i in range(20)]
+    assert a.filter_hosts(hosts) == hosts
+
+
+def test_second_instance_gets_a_fair_share(leases):
+    a, b = leases("a"), leases("b")
+    a.renew()
+    assert b.renew() == set()  # all leases are still held by a
+    assert a.renew() == {0, 1}  # a gives back what is above its share
+    assert b.renew() == {2, 3}
+    assert a.renew() == {0, 1}
+    hosts = [{"hostid": str(10000 + i)} for i in range(40)]
+    assert sorted(a.filter_hosts(hosts) + b.filter_hosts(hosts), key=lambda h: h["hostid"]) == hosts
+    assert all(shard_of(h["hostid"], 4) in {0, 1} for h in a.filter_hosts(hosts))
+
+
+def test_leases_of_a_silent_instance_expire(leases):
+    a, b = leases("a", ttl=1), leases("b", ttl=1)
+    a.renew()
+    b.renew()
+    a.renew()
+    assert b.renew() == {2, 3}
+    time.sleep(1.2)  # a stops renewing
+    assert b.renew() == {0, 1, 2, 3}
+
+
+def test_release_frees_leases_at_once(leases):
+    a, b = leases("a"), leases("b")
+    a.renew()
+    a.release()
+    assert a.owned == frozenset()
+    assert b.renew() == {0, 1, 2, 3}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT instance FROM collector_members")).scalars().all() == ["b"]
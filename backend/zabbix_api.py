@@ -0,0 +1,285 @@
+"""Pooled Zabbix JSON-RPC client shared by the collector, the notifier and the API.
+
+Every ``ZabbixAPI`` instance goes through one process-wide ``requests.Session``
+(HTTP keep-alive, connection pool sized to ``ZABBIX_MAX_CONCURRENCY``) and
+stamps each call with a unique JSON-RPC id. ``ZabbixAPI.map`` fans independent
+calls out over a bounded thread pool. Authentication goes through a shared
+``ZabbixSession`` so the whole process logs in once and reuses the token.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ZABBIX_API_URL = os.getenv("ZABBIX_API_URL", "http://zabbix-server/api_jsonrpc.php")
+ZABBIX_USER = os.getenv("ZABBIX_USER", "Admin")
+ZABBIX_PASSWORD = os.getenv("ZABBIX_PASSWORD", "zabbix")
+
+ZABBIX_MAX_CONCURRENCY = int(os.getenv("ZABBIX_MAX_CONCURRENCY", "8"))  # requests in flight
+ZABBIX_TIMEOUT = float(os.getenv("ZABBIX_TIMEOUT", "15"))  # seconds
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_executor: ThreadPoolExecutor | None = None
+_auth_sessions: dict[str, "ZabbixSession"] = {}
+
+
+def _next_request_id() -> int:
+    with _lock:
+        return next(_ids)
+
+
+def _http_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            size = max(ZABBIX_MAX_CONCURRENCY, 1)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ZABBIX_MAX_CONCURRENCY, thread_name_prefix="zabbix")
+        return _executor
+
+
+def _is_auth_error(error) -> bool:
+    if isinstance(error, dict):
+        error = f"{error.get('message', '')} {error.get('data', '')}"
+    text = str(error).lower()
+    return "re-login" in text or "not authori" in text or "session terminated" in text
+
+
+class ZabbixAuthError(RuntimeError):
+    """The Zabbix API rejected the auth token."""
+
+
+class ZabbixSession:
+    """Thread-safe, process-wide cache of a Zabbix auth token.
+
+    The token is obtained lazily with ``user.login`` and handed to every
+    ``ZabbixAPI`` bound to the same URL. ``invalidate`` drops it after an auth
+    error so the next caller logs in again.
+    """
+
+    def __init__(self, url: str = ZABBIX_API_URL, user: str = ZABBIX_USER, password: str = ZABBIX_PASSWORD):
+        self.url = url
+        self.user = user
+        self.password = password
+        self._token: str | None = None
+        self._lock = threading.Lock()
+        self.logins = 0
+        self.token_reuses = 0
+        self.invalidations = 0
+
+    def token(self) -> str:
+        with self._lock:
+            if self._token is not None:
+                self.token_reuses += 1
+                return self._token
+            self._token = ZabbixAPI(self.url, session=self)._request(
+                "user.login", {"user": self.user, "password": self.password}, auth=False
+            )
+            self.logins += 1
+            return self._token
+
+    def invalidate(self, token: str | None):
+        """Forget *token* unless another thread already replaced it."""
+        with self._lock:
+            if token is not None and self._token == token:
+                self._token = None
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "logins": self.logins,
+                "token_reuses": self.token_reuses,
+                "invalidations": self.invalidations,
+                "has_token": self._token is not None,
+            }
+
+
+def get_session(url: str = ZABBIX_API_URL) -> ZabbixSession:
+    """Return the shared ``ZabbixSession`` for *url*."""
+    with _lock:
+        if url not in _auth_sessions:
+            _auth_sessions[url] = ZabbixSession(url)
+        return _auth_sessions[url]
+
+
+class ZabbixAPI:
+    """Minimal Zabbix API wrapper (JSON-RPC 2.0).
+
+    Instances are cheap: all of them share one keep-alive connection pool, one
+    bounded worker pool and the auth token of their ``ZabbixSession``, so they
+    can be created per request or per thread. Authenticated calls log in on
+    demand and retry once with a fresh token if the current one was rejected.
+    """
+
+    def __init__(self, url: str = ZABBIX_API_URL, session: ZabbixSession | None = None):
+        self.url = url
+        self.session = session or get_session(url)
+        self.auth_token: str | None = None
+
+    def _request(self, method: str, params: dict, auth: bool = True):
+        if not auth:
+            return self._call(method, params, None)
+        if not self.auth_token:
+            self.auth_token = self.session.token()
+        try:
+            return self._call(method, params, self.auth_token)
+        except ZabbixAuthError:
+            self.session.invalidate(self.auth_token)
+            self.auth_token = self.session.token()
+            return self._call(method, params, self.auth_token)
+
+    def _call(self, method: str, params: dict, auth_token: str | None):
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": _next_request_id(),
+        }
+        if auth_token:
+            payload["auth"] = auth_token
+        headers = {"Content-Type": "application/json"}
+        resp = _http_session().post(self.url, headers=headers, json=payload, timeout=ZABBIX_TIMEOUT)
+        resp.raise_for_status()
+        res = resp.json()
+        if "error" in res:
+            if auth_token and _is_auth_error(res["error"]):
+                raise ZabbixAuthError(res["error"])
+            raise RuntimeError(res["error"])
+        return res["result"]
+
+    def map(self, fn: Callable[[T], R], args: Iterable[T]) -> list[R]:
+        """Run ``fn(arg)`` for every *arg* with at most ``ZABBIX_MAX_CONCURRENCY``
+        calls in flight; results keep the order of *args*."""
+        args = list(args)
+        if len(args) <= 1 or ZABBIX_MAX_CONCURRENCY <= 1:
+            return [fn(a) for a in args]
+        return list(_get_executor().map(fn, args))
+
+    def login(self):
+        """Attach the shared session token, logging in only if there is none yet."""
+        self.auth_token = self.session.token()
+
+    def host_get(self):
+        # Request both technical host ("host") and visible name ("name"), plus
+        # monitoring status and interface availability for /api/hosts/status
+        return self._request(
+            "host.get",
+            {
+                "output": ["hostid", "host", "name", "status"],
+                "selectInterfaces": ["type", "available", "error"],
+            },
+            auth=True,
+        )
+
+    def item_get(self, host_id, keys):
+        return self._request(
+            "item.get",
+            {
+                "output": ["itemid", "key_", "lastvalue", "lastclock", "lastns", "value_type"],
+                "hostids": [host_id],
+                "filter": {"key_": keys},
+                "sortfield": "name",
+            },
+            auth=True,
+        )
+
+    def item_get_many(self, host_ids, keys):
+        """Fetch items for several hosts in one call; rows carry their ``hostid``."""
+        return self._request(
+            "item.get",
+            {
+                "output": ["itemid", "hostid", "key_", "lastvalue", "lastclock", "lastns", "value_type"],
+                "hostids": list(host_ids),
+                "filter": {"key_": keys},
+            },
+            auth=True,
+        )
+
+    def history_get(self, item_ids, history: int, time_from: int, time_till: int):
+        """Samples of *item_ids* (all of value type *history*) in ``[time_from, time_till]``."""
+        return self._request(
+            "history.get",
+            {
+                "output": ["itemid", "clock", "ns", "value"],
+                "history": history,
+                "itemids": list(item_ids),
+                "time_from": time_from,
+                "time_till": time_till,
+                "sortfield": "clock",
+                "sortorder": "ASC",
+            },
+            auth=True,
+        )
+
+    def trends_get(self, item_ids, time_from: int, time_till: int):
+        """Hourly trend rows (min/avg/max) of *item_ids* in ``[time_from, time_till]``."""
+        return self._request(
+            "trend.get",
+            {
+                "output": ["itemid", "clock", "value_avg"],
+                "itemids": list(item_ids),
+                "time_from": time_from,
+                "time_till": time_till,
+            },
+            auth=True,
+        )
+
+    def problem_get(self):
+        return self._request(
+            "trigger.get",
+            {
+                "output": ["triggerid", "description", "priority"],
+                "filter": {"value": 1},  # 1 = Problem state
+                "selectHosts": ["host"],
+                "expandDescription": 1,
+                "sortfield": "lastchange",
+                "sortorder": "DESC",
+            },
+            auth=True,
+        )
+
+    def get_problem_by_id(self, trigger_id: str):
+        return self._request(
+            "trigger.get",
+            {
+                "output": ["triggerid", "description", "priority"],
+                "triggerids": [trigger_id],
+                "selectHosts": ["host"],
+                "expandDescription": 1,
+            },
+            auth=True,
+        )
+
+    def execute_script(self, script_id: str, host_id: str):
+        """Executes a script on a given host."""
+        return self._request(
+            "script.execute",
+            {
+                "scriptid": script_id,
+                "hostid": host_id,
+            },
+            auth=True,
+        )
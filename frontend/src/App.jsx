@@ -73,7 +73,7 @@ function App() {
             host_id: h.host_id,
             name: st.name || h.host_id,
             status: st.status || 'unknown',
-            last_check: st.last_check || new Date().toISOString(),
+            last_check: st.last_check || null, // null: never reported
             issues: st.issues || [],
             keys: h.keys,
           };
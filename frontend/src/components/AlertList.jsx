@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import useEvents from '../useEvents';
 import {
   Typography,
   List,
@@ -45,25 +46,34 @@ const AlertList = () => {
   const [remediating, setRemediating] = useState(false);
   const [remediationResult, setRemediationResult] = useState(null);
 
-  useEffect(() => {
-    const fetchAlerts = async () => {
-      try {
-        const apiBase = `${window.location.protocol}//${window.location.hostname}:8000`;
-        const response = await axios.get(`${apiBase}/api/alerts`);
-        setAlerts(response.data);
-        setError(null);
-      } catch (err) {
-        setError(err.message);
-      } finally {
-        setLoading(false);
-      }
-    };
+  const fetchAlerts = async () => {
+    try {
+      const apiBase = `${window.location.protocol}//${window.location.hostname}:8000`;
+      const response = await axios.get(`${apiBase}/api/alerts`);
+      setAlerts(response.data);
+      setError(null);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  };
 
+  useEffect(() => {
     fetchAlerts();
-    const interval = setInterval(fetchAlerts, 60000);
-    return () => clearInterval(interval);
   }, []);
 
+  // Apply alert diffs pushed by the backend; reload after a reconnect
+  useEvents({
+    reconnect: fetchAlerts,
+    alerts: ({ new: added, resolved }) => {
+      setAlerts((prev) => {
+        const gone = new Set([...resolved, ...added.map((a) => a.id)]);
+        return [...added, ...prev.filter((a) => !gone.has(a.id))];
+      });
+    },
+  });
+
   const handleAnalyzeClick = async (alert) => {
     if (!alert.id) {
       console.error("Analysis failed: Alert ID is missing.");
@@ -123,7 +133,7 @@ const AlertList = () => {
         ) : (
           alerts.map((alert) => (
             <ListItem
-              key={alert.triggerid}
+              key={alert.id}
               secondaryAction={
                 <Stack direction="column" spacing={0.5} alignItems="flex-end" sx={{ pr: 1 }}>
                   <IconButton color="primary" size="small" onClick={() => handleSendEmail(alert)} title="Send Email">
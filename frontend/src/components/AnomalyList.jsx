@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import useEvents from '../useEvents';
 import {
   Table,
   TableBody,
@@ -22,34 +23,42 @@ const AnomalyList = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const apiBase = `${window.location.protocol}//${window.location.hostname}:8000`;
-        const [anomalyRes, hostsRes] = await Promise.all([
-          axios.get(`${apiBase}/api/anomalies`),
-          axios.get(`${apiBase}/api/hosts/status`),
-        ]);
-        setAnomalies(anomalyRes.data);
-        const mapping = {};
-        hostsRes.data.forEach((h) => {
-          mapping[h.host_id] = h.name || h.host_id;
-        });
-        setHostNames(mapping);
-      } catch (err) {
-        setError('Failed to fetch anomalies.');
-        console.error(err);
-      } finally {
-        setLoading(false);
-      }
-    };
+  const fetchData = async () => {
+    try {
+      const apiBase = `${window.location.protocol}//${window.location.hostname}:8000`;
+      const [anomalyRes, hostsRes] = await Promise.all([
+        axios.get(`${apiBase}/api/anomalies`),
+        axios.get(`${apiBase}/api/hosts/status`),
+      ]);
+      setAnomalies(anomalyRes.data);
+      const mapping = {};
+      hostsRes.data.forEach((h) => {
+        mapping[h.host_id] = h.name || h.host_id;
+      });
+      setHostNames(mapping);
+    } catch (err) {
+      setError('Failed to fetch anomalies.');
+      console.error(err);
+    } finally {
+      setLoading(false);
+    }
+  };
 
+  useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 60000); // Refresh every minute
-
-    return () => clearInterval(interval);
   }, []);
 
+  // New anomalies are pushed as they are detected; reload after a reconnect
+  useEvents({
+    reconnect: fetchData,
+    anomalies: ({ anomalies: added }) => {
+      setAnomalies((prev) => {
+        const ids = new Set(added.map((a) => a.id));
+        return [...added, ...prev.filter((a) => !ids.has(a.id))].slice(0, 100);
+      });
+    },
+  });
+
   if (loading) {
     return <CircularProgress />;
   }
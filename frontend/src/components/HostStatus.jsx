@@ -11,21 +11,28 @@ import {
   Chip,
   Box,
 } from '@mui/material';
-import { green, red, orange } from '@mui/material/colors';
+import { green, red, orange, grey } from '@mui/material/colors';
 import CloudIcon from '@mui/icons-material/Cloud';
 import WarningIcon from '@mui/icons-material/Warning';
 import ErrorIcon from '@mui/icons-material/Error';
+import BlockIcon from '@mui/icons-material/Block';
+import HelpOutlineIcon from '@mui/icons-material/HelpOutline';
 
 const statusColors = {
   up: green[500],
   down: red[500],
   warning: orange[500],
+  // Not a problem: monitoring is off, or the host has not reported yet
+  disabled: grey[500],
+  unknown: grey[500],
 };
 
 const statusIcons = {
   up: <CloudIcon style={{ color: statusColors.up }} />,
   down: <ErrorIcon style={{ color: statusColors.down }} />,
   warning: <WarningIcon style={{ color: statusColors.warning }} />,
+  disabled: <BlockIcon style={{ color: statusColors.disabled }} />,
+  unknown: <HelpOutlineIcon style={{ color: statusColors.unknown }} />,
 };
 
 const HostStatus = ({ hosts }) => {
@@ -60,7 +67,7 @@ const HostStatus = ({ hosts }) => {
                 </TableCell>
                 <TableCell>{host.name}</TableCell>
                 <TableCell>
-                  {new Date(host.last_check).toLocaleString()}
+                  {host.last_check ? new Date(host.last_check).toLocaleString() : 'never'}
                 </TableCell>
                 <TableCell>
                   {host.issues.length > 0 ? (
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import useEvents from '../useEvents';
 import {
   Box,
   Typography,
@@ -34,48 +35,70 @@ const mockMetrics = [
   { time: '23:59', cpu: 25, memory: 40, networkIn: 400, networkOut: 200 },
 ];
 
+const rangeHours = (range) => (range === '24h' ? 24 : range === '7d' ? 24 * 7 : 24 * 30);
+
+const formatTimestamp = (timestamp, range) => {
+  const date = new Date(timestamp);
+  if (range === '24h') {
+    // Returns HH:mm format
+    return date.toLocaleTimeString('en-GB', { hour: '2-digit', minute: '2-digit' });
+  }
+  // Returns "Mon Day" format for 7d and 30d
+  return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
+};
+
+const bytesToGB = (bytes) => (bytes / (1024 ** 3)).toFixed(2);
+
+// One API metrics row (REST response or pushed event) as a chart point
+const toChartPoint = (r, range) => {
+  const totalGB = r.memory_total ? parseFloat(bytesToGB(r.memory_total)) : null;
+  return {
+    ts: new Date(r.timestamp).getTime(),
+    time: formatTimestamp(r.timestamp, range),
+    cpu: r.cpu_usage,
+    memoryBytes: r.memory_usage,
+    memoryGB: parseFloat(bytesToGB(r.memory_usage)),
+    memoryTotalGB: totalGB,
+    networkIn: parseFloat((r.network_in / 1024).toFixed(2)),
+    networkOut: parseFloat((r.network_out / 1024).toFixed(2)),
+  };
+};
+
+// `?format=columnar` response (parallel arrays) back to one row per timestamp
+const columnsToRows = (cols) =>
+  cols.timestamp.map((timestamp, i) => ({
+    timestamp,
+    cpu_usage: cols.cpu_usage[i],
+    memory_usage: cols.memory_usage[i],
+    memory_total: cols.memory_total[i],
+    network_in: cols.network_in[i],
+    network_out: cols.network_out[i],
+  }));
+
 const NetworkMetrics = ({ hostId }) => {
   const [tabValue, setTabValue] = useState(0);
   const [loading, setLoading] = useState(true);
   const [timeRange, setTimeRange] = useState('24h');
   const [metrics, setMetrics] = useState([]);
   const [error, setError] = useState(null);
+  const [reloads, setReloads] = useState(0);
 
   useEffect(() => {
     setError(null); // Reset error on new fetch
 
-    const formatTimestamp = (timestamp, range) => {
-      const date = new Date(timestamp);
-      if (range === '24h') {
-        // Returns HH:mm format
-        return date.toLocaleTimeString('en-GB', { hour: '2-digit', minute: '2-digit' });
-      }
-      // Returns "Mon Day" format for 7d and 30d
-      return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
-    };
-
     const fetchMetrics = async () => {
       if (!hostId) return;
       try {
-        const hours = timeRange === '24h' ? 24 : timeRange === '7d' ? 24 * 7 : 24 * 30;
+        const hours = rangeHours(timeRange);
         const apiBase = `${window.location.protocol}//${window.location.hostname}:8000`;
-        const response = await axios.get(`${apiBase}/api/metrics/${hostId}?hours=${hours}`);
-        
-        const bytesToGB = (bytes) => (bytes / (1024 ** 3)).toFixed(2);
-        
-        const data = response.data.map((r) => {
-          const totalGB = r.memory_total ? parseFloat(bytesToGB(r.memory_total)) : null;
-          return {
-            time: formatTimestamp(r.timestamp, timeRange),
-            cpu: r.cpu_usage,
-            memoryBytes: r.memory_usage,
-            memoryGB: parseFloat(bytesToGB(r.memory_usage)),
-            memoryTotalGB: totalGB,
-            networkIn: parseFloat((r.network_in / 1024).toFixed(2)),
-            networkOut: parseFloat((r.network_out / 1024).toFixed(2)),
-          };
-        });
-        setMetrics(data);
+        // The 24h view asks for every raw sample (max_points=0) so the pushed
+        // samples below extend the same series; the default point budget would
+        // serve it from the 5-minute rollup.
+        const maxPoints = timeRange === '24h' ? '&max_points=0' : '';
+        const response = await axios.get(
+          `${apiBase}/api/metrics/${hostId}?hours=${hours}&format=columnar${maxPoints}`,
+        );
+        setMetrics(columnsToRows(response.data).map((r) => toChartPoint(r, timeRange)));
         setLoading(false);
       } catch (error) {
         console.error('Error fetching metrics:', error);
@@ -85,7 +108,28 @@ const NetworkMetrics = ({ hostId }) => {
 
     setLoading(true);
     fetchMetrics();
-  }, [hostId, timeRange]);
+  }, [hostId, timeRange, reloads]);
+
+  // New samples of this host are pushed by the collector. Only the 24h view,
+  // fetched raw, is extended in place; the 7d / 30d views show rollup buckets.
+  useEvents(
+    {
+      reconnect: () => setReloads((n) => n + 1),
+      metrics: ({ host_id: eventHost, points }) => {
+        if (eventHost !== hostId || timeRange !== '24h') return;
+        const since = Date.now() - rangeHours(timeRange) * 3600 * 1000;
+        setMetrics((prev) => {
+          const byTs = new Map(prev.filter((m) => m.ts >= since).map((m) => [m.ts, m]));
+          points.forEach((p) => {
+            const point = toChartPoint(p, timeRange);
+            byTs.set(point.ts, point);
+          });
+          return [...byTs.values()].sort((a, b) => a.ts - b.ts);
+        });
+      },
+    },
+    hostId ? [hostId] : [],
+  );
 
   const handleTabChange = (event, newValue) => {
     setTabValue(newValue);
@@ -0,0 +1,42 @@
+import { useEffect, useRef } from 'react';
+
+/**
+ * Subscribe to the backend's Server-Sent Events stream (/api/events).
+ *
+ * `handlers` maps event types ('metrics', 'alerts', 'anomalies') to callbacks
+ * receiving the parsed payload; the optional `reconnect` handler runs when the
+ * stream comes back after a drop so a component can reload what it missed.
+ * `hosts` limits host events to the given host ids.
+ */
+const useEvents = (handlers, hosts = null) => {
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  const types = Object.keys(handlers).filter((t) => t !== 'reconnect').sort().join(',');
+  const hostList = hosts ? [].concat(hosts).filter(Boolean).join(',') : '';
+
+  useEffect(() => {
+    if (hosts !== null && !hostList) return undefined;
+
+    const apiBase = `${window.location.protocol}//${window.location.hostname}:8000`;
+    const params = new URLSearchParams({ types });
+    if (hostList) params.set('hosts', hostList);
+    const source = new EventSource(`${apiBase}/api/events?${params}`);
+
+    let opened = false;
+    source.onopen = () => {
+      if (opened) handlersRef.current.reconnect?.();
+      opened = true;
+    };
+    types.split(',').forEach((type) => {
+      source.addEventListener(type, (event) => {
+        handlersRef.current[type]?.(JSON.parse(event.data));
+      });
+    });
+
+    return () => source.close();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [types, hostList]);
+};
+
+export default useEvents;